@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from session_cache import session_cache
+
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = {"GET", "HEAD"}
+AUTH_SESSION_PATH = "/api/auth/session"
+# Scrapes and CORS preflights must keep working while the API sheds load
+EXEMPT_PATHS = {"/api/metrics"}
+
+
+class AdmissionPool:
+    """Concurrency limit with a bounded FIFO wait queue.
+
+    Up to ``max_concurrent`` requests run at once and up to ``max_queue``
+    more wait, each for at most ``queue_timeout`` seconds. Anything beyond
+    that is turned away immediately instead of piling up behind Mongo.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            # release() hands its slot straight to the waiter, so active is
+            # already counted when the future resolves
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self._waiters and self.active <= self.max_concurrent:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def configure(self, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None,
+                  queue_timeout: Optional[float] = None) -> None:
+        if max_concurrent is not None:
+            self.max_concurrent = max_concurrent
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if queue_timeout is not None:
+            self.queue_timeout = queue_timeout
+        # A raised limit admits queued requests right away
+        while self._waiters and self.active < self.max_concurrent:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class RateLimiter:
+    """Token buckets per key, refilled at ``rate`` per second up to ``burst``.
+
+    Buckets live in an LRU capped at ``max_keys`` so a scan across many IPs
+    cannot grow memory without bound; an evicted key simply starts full.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, last refill)
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self.limited = 0
+
+    def take(self, key: str) -> float:
+        """Spend one token; returns 0 when allowed, else seconds until a token is free"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+            self.limited += 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def configure(self, rate: Optional[float] = None, burst: Optional[float] = None) -> None:
+        if rate is not None:
+            self.rate = rate
+        if burst is not None:
+            self.burst = burst
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "tracked_keys": len(self._buckets), "limited": self.limited}
+
+
+class AdmissionController:
+    """Admission control for the API: rate limits first, then a concurrency pool.
+
+    Requests are classed as ``auth`` (the session exchange, which calls out to
+    the auth provider), ``read`` (GET/HEAD) or ``write`` (everything else),
+    and each class has its own pool so a burst of one cannot starve the
+    others. Every request spends a token from its client IP's bucket, and
+    requests carrying a session token also spend one from their user's
+    bucket.
+
+    The client IP is the peer address unless ``trust_forwarded_for`` is set,
+    in which case it is the ``X-Forwarded-For`` entry appended by the
+    outermost of ``trusted_proxies`` proxies. Entries to the left of that
+    come from the client and are never trusted. A request forwarded by an
+    untrusted proxy skips the IP bucket: its peer address is the proxy,
+    which every client behind it shares.
+    """
+
+    def __init__(self, pools: Dict[str, AdmissionPool], ip_limiter: RateLimiter, user_limiter: RateLimiter,
+                 trust_forwarded_for: bool = False, trusted_proxies: int = 1, retry_after: int = 1):
+        self.pools = pools
+        self.ip_limiter = ip_limiter
+        self.user_limiter = user_limiter
+        self.trust_forwarded_for = trust_forwarded_for
+        self.trusted_proxies = trusted_proxies
+        self.retry_after = retry_after
+        self._warned_untrusted = False
+
+    def classify(self, request: Request) -> str:
+        if request.url.path == AUTH_SESSION_PATH:
+            return "auth"
+        return "read" if request.method in READ_METHODS else "write"
+
+    def client_ip(self, request: Request) -> Optional[str]:
+        """The address to rate-limit, or None when it cannot be told apart from a proxy's"""
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded and self.trust_forwarded_for and self.trusted_proxies > 0:
+            hops = [hop.strip() for hop in forwarded.split(",")]
+            if len(hops) >= self.trusted_proxies:
+                return hops[-self.trusted_proxies]
+        elif forwarded:
+            if not self._warned_untrusted:
+                self._warned_untrusted = True
+                logger.warning("Requests arrive through a proxy but X-Forwarded-For is not trusted; "
+                               "per-IP rate limits are skipped. Set ADMISSION_TRUST_FORWARDED_FOR and "
+                               "ADMISSION_TRUSTED_PROXIES to enable them")
+            return None
+        return request.client.host if request.client else "unknown"
+
+    @staticmethod
+    def session_key(request: Request) -> Optional[str]:
+        """Rate-limit key for the requesting user.
+
+        Keyed on the user id once this worker has the session cached, so
+        opening more sessions does not buy more quota; a session not cached
+        yet is limited on its own until its first authenticated request.
+        """
+        token = request.cookies.get("session_token")
+        authorization = request.headers.get("authorization", "")
+        if not token and authorization.startswith("Bearer "):
+            token = authorization[len("Bearer "):]
+        if not token:
+            return None
+        user_id = session_cache.user_id(token)
+        if user_id is not None:
+            return f"user:{user_id}"
+        # Hashed so the limiter never holds live credentials
+        return "session:" + hashlib.sha256(token.encode()).hexdigest()[:32]
+
+    def _reject(self, status_code: int, detail: str, retry_after: float) -> JSONResponse:
+        return JSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def __call__(self, request: Request, call_next):
+        if request.method == "OPTIONS" or request.url.path in EXEMPT_PATHS:
+            return await call_next(request)
+
+        ip = self.client_ip(request)
+        wait = self.ip_limiter.take(ip) if ip is not None else 0.0
+        session = self.session_key(request)
+        if not wait and session:
+            wait = self.user_limiter.take(session)
+        if wait:
+            return self._reject(429, "Too many requests", wait)
+
+        pool = self.pools[self.classify(request)]
+        if not await pool.acquire():
+            return self._reject(503, "Server is busy, try again shortly", self.retry_after)
+        try:
+            return await call_next(request)
+        finally:
+            pool.release()
+
+    def configure(self, settings: dict) -> None:
+        """Apply a partial update of pool and rate-limit settings at runtime"""
+        for name, limits in (settings.get("pools") or {}).items():
+            self.pools[name].configure(**limits)
+        for name, limits in (settings.get("rate_limits") or {}).items():
+            getattr(self, f"{name}_limiter").configure(**limits)
+
+    def stats(self) -> dict:
+        return {
+            "pools": {name: pool.stats() for name, pool in self.pools.items()},
+            "rate_limits": {"ip": self.ip_limiter.stats(), "user": self.user_limiter.stats()},
+        }
+
+
+def _pool(name: str, concurrency: str, queue: str) -> AdmissionPool:
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionPool(
+        name,
+        max_concurrent=int(os.environ.get(f"{prefix}_CONCURRENCY", concurrency)),
+        max_queue=int(os.environ.get(f"{prefix}_QUEUE", queue)),
+        queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2')),
+    )
+
+
+admission = AdmissionController(
+    pools={
+        "read": _pool("read", "200", "400"),
+        "write": _pool("write", "50", "100"),
+        "auth": _pool("auth", "10", "20"),
+    },
+    ip_limiter=RateLimiter(
+        rate=float(os.environ.get('RATE_LIMIT_IP_RATE', '50')),
+        burst=float(os.environ.get('RATE_LIMIT_IP_BURST', '100')),
+    ),
+    user_limiter=RateLimiter(
+        rate=float(os.environ.get('RATE_LIMIT_USER_RATE', '20')),
+        burst=float(os.environ.get('RATE_LIMIT_USER_BURST', '40')),
+    ),
+    # Behind an ingress the peer address is the proxy; enable this and set the
+    # number of proxies that append to X-Forwarded-For in front of the app
+    trust_forwarded_for=os.environ.get('ADMISSION_TRUST_FORWARDED_FOR', 'false').lower() == 'true',
+    trusted_proxies=int(os.environ.get('ADMISSION_TRUSTED_PROXIES', '1')),
+    retry_after=int(os.environ.get('ADMISSION_RETRY_AFTER', '1')),
+)
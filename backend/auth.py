@@ -1,27 +1,51 @@
+import hmac
 from fastapi import HTTPException, Cookie, Header
 from typing import Optional
-import httpx
 import os
 from datetime import datetime, timedelta, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from session_cache import session_cache
+from auth_client import AuthProviderClient, AuthProviderError, CircuitBreaker, CircuitOpenError, InvalidSessionError
+from serialization import NO_ID
+from counters import counter_buffer
 
 
 EMERGENT_SESSION_API = os.environ.get('AUTH_API_URL', 'https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data')
+# Comma-separated emails allowed to use the /admin routes; nobody when unset
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+# Bearer token a Prometheus scraper presents to /metrics; admins need none
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# Pooled client shared by every login; opened and closed by the app lifespan
+auth_provider = AuthProviderClient(
+    EMERGENT_SESSION_API,
+    timeout=float(os.environ.get('AUTH_API_TIMEOUT', '5')),
+    max_connections=int(os.environ.get('AUTH_API_MAX_CONNECTIONS', '20')),
+    retries=int(os.environ.get('AUTH_API_RETRIES', '2')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('AUTH_API_BREAKER_THRESHOLD', '5')),
+        reset_timeout=float(os.environ.get('AUTH_API_BREAKER_RESET', '30')),
+    ),
+)
 
 
 async def exchange_session_id(session_id: str) -> dict:
     """Exchange session_id for user data from Emergent Auth API"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                EMERGENT_SESSION_API,
-                headers={"X-Session-ID": session_id},
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=401, detail="Invalid session_id")
+    try:
+        return await auth_provider.exchange(session_id)
+    except InvalidSessionError:
+        raise HTTPException(status_code=401, detail="Invalid session_id")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Auth provider unavailable",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    except AuthProviderError:
+        raise HTTPException(status_code=503, detail="Auth provider unavailable")
 
 
 async def get_current_user(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
@@ -38,6 +62,11 @@ async def get_current_user(session_token: Optional[str] = Cookie(None), authoriz
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    # Serve repeat requests from the in-process session cache
+    cached_user = session_cache.get(token)
+    if cached_user is not None:
+        return counter_buffer.merge("users", cached_user)
+    
     # Find session in database
     session = await db.sessions.find_one({"session_token": token})
     if not session:
@@ -50,30 +79,48 @@ async def get_current_user(session_token: Optional[str] = Cookie(None), authoriz
     elif expires_at.tzinfo is None:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
     
+    # Expired sessions are removed by the TTL index on sessions.expires_at
     if expires_at < datetime.now(timezone.utc):
-        await db.sessions.delete_one({"session_token": token})
         raise HTTPException(status_code=401, detail="Session expired")
     
     # Get user
-    user = await db.users.find_one({"id": session["user_id"]})
+    user = await db.users.find_one({"id": session["user_id"]}, NO_ID)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    # Remove MongoDB _id field and return
-    if '_id' in user:
-        del user['_id']
-    
+    session_cache.set(token, user, expires_at, str(session["_id"]))
+    return counter_buffer.merge("users", user)
+
+
+async def require_admin(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)) -> dict:
+    """Get current user, rejecting anyone not listed in ADMIN_EMAILS"""
+    user = await get_current_user(session_token, authorization)
+    if user.get("email", "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
     return user
 
 
+async def require_metrics_access(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)) -> Optional[dict]:
+    """Allow the metrics scraper's METRICS_TOKEN, or else an admin session"""
+    if METRICS_TOKEN and authorization and authorization.startswith("Bearer "):
+        if hmac.compare_digest(authorization[len("Bearer "):].encode(), METRICS_TOKEN.encode()):
+            return None
+    return await require_admin(session_token, authorization)
+
+
+async def get_optional_user(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)) -> Optional[dict]:
+    """Get current user if a valid session is present, otherwise None"""
+    try:
+        return await get_current_user(session_token, authorization)
+    except HTTPException:
+        return None
+
+
 async def create_or_update_user(db: AsyncIOMotorDatabase, user_data: dict) -> dict:
     """Create new user or return existing user"""
-    existing_user = await db.users.find_one({"email": user_data["email"]})
+    existing_user = await db.users.find_one({"email": user_data["email"]}, NO_ID)
     
     if existing_user:
-        # Remove MongoDB _id field
-        if '_id' in existing_user:
-            del existing_user['_id']
         return existing_user
     
     # Create new user
@@ -83,7 +130,11 @@ async def create_or_update_user(db: AsyncIOMotorDatabase, user_data: dict) -> di
         name=user_data["name"],
         picture=user_data.get("picture")
     )
-    await db.users.insert_one(new_user.dict())
+    try:
+        await db.users.insert_one(new_user.dict())
+    except DuplicateKeyError:
+        # A concurrent login for the same email created the user first
+        return await db.users.find_one({"email": user_data["email"]}, NO_ID)
     return new_user.dict()
 
 
@@ -96,5 +147,34 @@ async def create_session(db: AsyncIOMotorDatabase, user_id: str, session_token:
         user_id=user_id,
         expires_at=expires_at
     )
-    await db.sessions.insert_one(session.dict())
-    return session.dict()
\ No newline at end of file
+    # Upsert so a double-submitted login reusing the same token stays idempotent
+    await db.sessions.update_one(
+        {"session_token": session_token},
+        {"$setOnInsert": session.dict()},
+        upsert=True
+    )
+    return session.dict()
+
+
+async def verify_cached_sessions(db: AsyncIOMotorDatabase, chunk_size: int = 500) -> None:
+    """Drop cached sessions that were deleted, or whose user changed, in another worker.
+
+    Used when change streams are unavailable: one ``$in`` read per chunk
+    of cached tokens and one for their users.
+    """
+    entries = session_cache.entries()
+    for start in range(0, len(entries), chunk_size):
+        chunk = dict(entries[start:start + chunk_size])
+        live = await db.sessions.find(
+            {"session_token": {"$in": list(chunk)}}, {"_id": 0, "session_token": 1}
+        ).to_list(None)
+        live = {session["session_token"] for session in live}
+        for token in chunk.keys() - live:
+            session_cache.invalidate_token(token)
+
+        cached_users = {chunk[token]["id"]: chunk[token] for token in live}
+        users = await db.users.find({"id": {"$in": list(cached_users)}}, NO_ID).to_list(None)
+        current = {user["id"]: user for user in users}
+        for user_id, cached in cached_users.items():
+            if current.get(user_id) != cached:
+                session_cache.invalidate_user(user_id)
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuthProviderError(Exception):
+    """The auth provider could not be reached or kept failing"""
+
+
+class InvalidSessionError(Exception):
+    """The auth provider rejected the session_id"""
+
+
+class CircuitOpenError(AuthProviderError):
+    """Calls are short-circuited while the provider is considered down"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Auth provider circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and
+    calls fail fast for ``reset_timeout`` seconds. The first call after
+    that is let through as a probe while everyone else keeps failing fast;
+    success closes the circuit again, failure re-opens it. A probe that
+    never reports back frees the slot after another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def check(self) -> None:
+        """Raise CircuitOpenError unless a call may go through"""
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(self.reset_timeout - (time.monotonic() - self.opened_at))
+        if state == "half-open":
+            now = time.monotonic()
+            if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+                raise CircuitOpenError(self.reset_timeout - (now - self.probe_started_at))
+            self.probe_started_at = now
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probe_started_at = None
+
+
+class AuthProviderClient:
+    """Long-lived, pooled client for the session-data endpoint of the auth provider.
+
+    Concurrent exchanges of the same session_id share a single upstream
+    request. Transport errors and 5xx responses are retried with jittered
+    exponential backoff, and a circuit breaker stops a slow provider from
+    tying up every worker.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        max_connections: int = 20,
+        retries: int = 2,
+        backoff: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def exchange(self, session_id: str) -> dict:
+        """Exchange a session_id for user data, deduplicating concurrent calls"""
+        task = self._in_flight.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(session_id))
+            self._in_flight[session_id] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(session_id, None))
+        # Shield so one caller giving up does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _fetch(self, session_id: str) -> dict:
+        await self.start()
+        self.breaker.check()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._client.get(self.url, headers={"X-Session-ID": session_id})
+            except httpx.TransportError as e:
+                error = e
+            else:
+                if 400 <= response.status_code < 500:
+                    # The provider answered; a 4xx is about the session, not its health
+                    self.breaker.record_success()
+                    raise InvalidSessionError(f"Auth provider returned {response.status_code}")
+                if response.status_code < 400:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        # A garbled success is a provider fault like a 5xx
+                        error = AuthProviderError(f"Auth provider returned an unreadable body: {e}")
+                    else:
+                        if isinstance(data, dict):
+                            self.breaker.record_success()
+                            return data
+                        error = AuthProviderError("Auth provider returned a body that is not a JSON object")
+                else:
+                    error = httpx.HTTPStatusError(
+                        f"Auth provider returned {response.status_code}", request=response.request, response=response
+                    )
+
+            logger.warning(f"Auth provider call failed (attempt {attempt + 1}/{self.retries + 1}): {error}")
+            if attempt < self.retries:
+                # Full jitter keeps retrying workers from stampeding together
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+        # One exhausted exchange is one failure, however many attempts it made
+        self.breaker.record_failure()
+        raise AuthProviderError(str(error))
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,99 @@
+"""Compare the legacy and fast response serialization paths on list endpoints.
+
+The legacy path mirrors what the list endpoints used to do per request: walk
+every document to stringify ``_id``, let FastAPI validate the list against
+``response_model`` and encode it with the stdlib ``json`` module. The fast path
+is what they do now: ``_id`` is projected away by Mongo and the trusted
+documents are encoded straight to bytes.
+
+Run from the backend directory:
+
+    python benchmarks/bench_serialization.py --items 1000 --rounds 200
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import AffiliateTool, LearningPath, Video  # noqa: E402
+from serialization import dumps  # noqa: E402
+
+
+def convert_objectid(obj):
+    """The recursive walk formerly done by MongoJSONEncoder.convert_objectid"""
+    if isinstance(obj, list):
+        return [convert_objectid(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: convert_objectid(value) for key, value in obj.items()}
+    elif isinstance(obj, ObjectId):
+        return str(obj)
+    return obj
+
+
+def make_documents(model, count: int) -> List[dict]:
+    now = datetime.utcnow()
+    documents = []
+    for i in range(count):
+        if model is LearningPath:
+            doc = LearningPath(title=f"Path {i}", description="Learn the essentials " * 4,
+                               difficulty="Beginner", duration="4 weeks", modules=12, enrolled=i)
+        elif model is Video:
+            doc = Video(title=f"Video {i}", description="Step by step tutorial " * 4,
+                        thumbnail="https://example.com/thumb.jpg", videoUrl="https://example.com/v",
+                        duration="12:34", views="1.2K", platforms=["YouTube", "TikTok"],
+                        created_at=now - timedelta(minutes=i))
+        else:
+            doc = AffiliateTool(name=f"Tool {i}", description="A useful tool " * 4, category="Tools",
+                                price=19.99, rating=4.5, image="https://example.com/tool.jpg",
+                                affiliateLink="https://example.com/a", featured=i % 10 == 0)
+        documents.append(doc.model_dump())
+    return documents
+
+
+def legacy_path(adapter: TypeAdapter, documents_with_id: List[dict]) -> bytes:
+    converted = convert_objectid(documents_with_id)
+    validated = adapter.validate_python(converted)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(documents: List[dict]) -> bytes:
+    return dumps(documents)
+
+
+def measure(fn, rounds: int) -> float:
+    """Return the mean CPU time per call in milliseconds"""
+    fn()
+    start = time.process_time()
+    for _ in range(rounds):
+        fn()
+    return (time.process_time() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000, help="documents per list response")
+    parser.add_argument("--rounds", type=int, default=200, help="requests simulated per model")
+    args = parser.parse_args()
+
+    print(f"{'model':<16}{'legacy ms':>12}{'fast ms':>12}{'saved ms':>12}{'speedup':>10}")
+    for model in (LearningPath, Video, AffiliateTool):
+        documents = make_documents(model, args.items)
+        documents_with_id = [{"_id": ObjectId(), **doc} for doc in documents]
+        adapter = TypeAdapter(List[model])
+
+        legacy = measure(lambda: legacy_path(adapter, documents_with_id), args.rounds)
+        fast = measure(lambda: fast_path(documents), args.rounds)
+        print(f"{model.__name__:<16}{legacy:>12.3f}{fast:>12.3f}{legacy - fast:>12.3f}{legacy / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Reproducible load benchmark for the API.
+
+Boots the FastAPI app in-process against a Mongo stand-in (mongomock-motor)
+or a real ``--mongo-url``, seeds it at the requested scale, then drives a
+mixed read/write workload from concurrent async clients and reports
+p50/p95/p99 latency and throughput per route.
+
+Run from the backend directory:
+
+    # quick run on the in-process stand-in
+    python benchmarks/load_bench.py --scale 0.01 --duration 20
+
+    # full scale against a local mongod, saving the result as the baseline
+    python benchmarks/load_bench.py --mongo-url mongodb://localhost:27017 \\
+        --save-baseline benchmarks/baseline.json
+
+    # fail (exit 1) when a route regresses more than 15% against the baseline
+    python benchmarks/load_bench.py --baseline benchmarks/baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Full-scale dataset; --scale multiplies every count
+FULL_SCALE = {"users": 1000, "builds": 10_000, "topics": 100_000, "replies": 1_000_000, "events": 100}
+# --mongo-url databases are dropped before seeding; only these by default
+BENCH_DB_PREFIX = "bench_"
+CATEGORIES = ["hardware", "software", "builds", "troubleshooting", "overclocking", "cooling"]
+WORDS = ("gpu cpu ram cooling loop radiator pump fan cable psu motherboard bios overclock "
+         "thermal paste airflow case nvme benchmark driver rgb voltage").split()
+
+# (route label, weight); labels group parametrised paths in the report
+DEFAULT_MIX = {
+    "GET /api/home": 15,
+    "GET /api/learning-paths": 8,
+    "GET /api/videos": 5,
+    "GET /api/affiliate-tools": 5,
+    "GET /api/events": 8,
+    "GET /api/builds": 10,
+    "GET /api/forum/topics": 12,
+    "GET /api/forum/topics/{id}/thread": 10,
+    "GET /api/forum/search": 5,
+    "GET /api/auth/me": 8,
+    "POST /api/builds/{id}/like": 6,
+    "POST /api/forum/topics/{id}/reply": 4,
+    "POST /api/builds": 2,
+    "POST /api/events/{id}/register": 2,
+}
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+async def insert_batches(collection, documents, batch_size: int = 5000) -> None:
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def seed(db, counts: Dict[str, int], rng: random.Random) -> dict:
+    """Seed users, sessions, builds, topics, replies and events; returns ids for the workload"""
+    now = datetime.utcnow()
+    users = [f"bench-user-{i}" for i in range(counts["users"])]
+    tokens = [f"bench-token-{i}" for i in range(counts["users"])]
+    builds = [f"bench-build-{i}" for i in range(counts["builds"])]
+    topics = [f"bench-topic-{i}" for i in range(counts["topics"])]
+    events = [f"bench-event-{i}" for i in range(counts["events"])]
+
+    await insert_batches(db.users, ({
+        "id": user_id, "email": f"{user_id}@bench.local", "name": user_id, "picture": None,
+        "joined": now, "buildsShared": 0, "coursesCompleted": 0, "communityRank": "Bronze",
+    } for user_id in users))
+    await insert_batches(db.sessions, ({
+        "session_token": token, "user_id": user_id,
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=7), "created_at": now,
+    } for token, user_id in zip(tokens, users)))
+    await insert_batches(db.builds, ({
+        "id": build_id, "title": sentence(rng, 4), "builder": "bench", "builder_id": rng.choice(users),
+        "image": "https://example.com/build.jpg", "specs": sentence(rng, 12),
+        "likes": rng.randint(0, 500), "date": now - timedelta(minutes=i),
+    } for i, build_id in enumerate(builds)))
+    await insert_batches(db.forum_topics, ({
+        "id": topic_id, "title": sentence(rng, 6), "author": "bench", "author_id": rng.choice(users),
+        "category": rng.choice(CATEGORIES), "replies": 0, "views": 0,
+        "lastActivity": now - timedelta(minutes=i), "isPinned": False, "created_at": now - timedelta(minutes=i),
+    } for i, topic_id in enumerate(topics)))
+    await insert_batches(db.forum_replies, ({
+        "id": f"bench-reply-{i}", "topic_id": topics[i % len(topics)], "author": "bench",
+        "author_id": rng.choice(users), "content": sentence(rng, 20), "created_at": now - timedelta(seconds=i),
+    } for i in range(counts["replies"])) if topics else ())
+    # Room for every user, so registrations measure the write rather than "Event is full"
+    await insert_batches(db.events, ({
+        "id": event_id, "title": sentence(rng, 4), "date": (now + timedelta(days=i + 1)).date().isoformat(),
+        "time": "18:00 UTC", "location": "Online", "image": "https://example.com/event.jpg",
+        "attendees": 0, "maxAttendees": len(users), "description": sentence(rng, 12),
+    } for i, event_id in enumerate(events)))
+
+    return {"tokens": tokens, "builds": builds, "topics": topics, "events": events}
+
+
+def request_for(route: str, ids: dict, rng: random.Random) -> tuple:
+    """Build (method, url, kwargs) for one workload operation"""
+    method, template = route.split(" ", 1)
+    headers = {"Authorization": f"Bearer {rng.choice(ids['tokens'])}"}
+    build_id = rng.choice(ids["builds"]) if ids["builds"] else "missing"
+    topic_id = rng.choice(ids["topics"]) if ids["topics"] else "missing"
+    event_id = rng.choice(ids["events"]) if ids["events"] else "missing"
+
+    if route == "GET /api/forum/topics":
+        return method, template, {"params": {"category": rng.choice(CATEGORIES), "limit": 20}}
+    if route == "GET /api/forum/search":
+        return method, template, {"params": {"q": rng.choice(WORDS)[:3]}}
+    if route == "GET /api/builds":
+        return method, template, {"params": {"limit": 10}}
+    if route == "GET /api/auth/me":
+        return method, template, {"headers": headers}
+    if route == "POST /api/builds":
+        return method, template, {"headers": headers, "json": {
+            "title": "bench build", "image": "https://example.com/b.jpg", "specs": sentence(rng, 8)}}
+    if route == "POST /api/forum/topics/{id}/reply":
+        return method, template.format(id=topic_id), {"headers": headers, "params": {"content": sentence(rng, 15)}}
+    if route == "POST /api/events/{id}/register":
+        return method, template.format(id=event_id), {"headers": headers}
+    if route.startswith("POST"):
+        return method, template.format(id=build_id), {"headers": headers}
+    return method, template.format(id=topic_id), {}
+
+
+async def run_workload(client: httpx.AsyncClient, ids: dict, mix: Dict[str, int], concurrency: int,
+                       duration: float, seed_value: int) -> tuple:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    routes, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed_value + index)
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights)[0]
+            method, url, kwargs = request_for(route, ids, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                # 4xx from business rules (full event, duplicate registration) are expected
+                if response.status_code >= 500:
+                    errors[route] += 1
+            except httpx.HTTPError:
+                errors[route] += 1
+            latencies[route].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    summary = {}
+    for route in sorted(latencies):
+        values = sorted(latencies[route])
+        summary[route] = {
+            "count": len(values),
+            "errors": errors.get(route, 0),
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    print(f"{'route':<40}{'count':>8}{'err':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, row in summary.items():
+        print(f"{route:<40}{row['count']:>8}{row['errors']:>6}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Describe every route whose p95 or throughput regressed beyond ``tolerance``"""
+    regressions = []
+    for route, row in summary.items():
+        reference = baseline.get(route)
+        if not reference:
+            continue
+        if row["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {row['p95_ms']:.2f} ms vs baseline {reference['p95_ms']:.2f} ms")
+        if row["rps"] < reference["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: {row['rps']:.1f} rps vs baseline {reference['rps']:.1f} rps")
+        if row["errors"] > reference.get("errors", 0):
+            regressions.append(f"{route}: {row['errors']} errors vs baseline {reference.get('errors', 0)}")
+    return regressions
+
+
+async def main(args) -> int:
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    else:
+        os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = args.db_name
+    if args.mongo_url and not (args.db_name.startswith(BENCH_DB_PREFIX) or args.drop):
+        print(f"Refusing to drop {args.db_name!r} on {args.mongo_url}: bench databases are named "
+              f"{BENCH_DB_PREFIX}*; pass --drop to drop another one", file=sys.stderr)
+        return 2
+    import server
+
+    if not args.mongo_url:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("mongomock-motor is not installed; pass --mongo-url to use a real server", file=sys.stderr)
+            return 2
+        server.client = AsyncMongoMockClient()
+        server.db = server.public_db = server.client[args.db_name]
+    else:
+        await server.client.drop_database(args.db_name)
+
+    counts = {name: int(count * args.scale) for name, count in FULL_SCALE.items()}
+    counts["users"] = max(counts["users"], 1)
+    counts["events"] = max(counts["events"], 1)
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    ids = await seed(server.db, counts, rng)
+    print(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+
+    # Startup runs the migrations, so the seeded data reaches the search
+    # index, leaderboard, summaries and event start times before measuring
+    started = time.perf_counter()
+    for handler in server.app.router.on_startup:
+        await handler()
+    print(f"Started up in {time.perf_counter() - started:.1f}s")
+    # One client drives the whole workload; per-IP and per-session token
+    # buckets would measure the rate limiter, not the API
+    unlimited = {"rate": 1e9, "burst": 1e9}
+    server.admission.configure({"rate_limits": {"ip": unlimited, "user": unlimited}})
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        if args.warmup:
+            await run_workload(client, ids, DEFAULT_MIX, args.concurrency, args.warmup, args.seed + 1000)
+        latencies, errors, elapsed = await run_workload(
+            client, ids, DEFAULT_MIX, args.concurrency, args.duration, args.seed
+        )
+
+    for handler in server.app.router.on_shutdown:
+        await handler()
+
+    summary = summarize(latencies, errors, elapsed)
+    print_summary(summary)
+    total = sum(row["count"] for row in summary.values())
+    print(f"Total: {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} rps) "
+          f"with {args.concurrency} clients")
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(summary, indent=2, sort_keys=True))
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(summary, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", help="real MongoDB to run against (default: in-process mongomock-motor)")
+    parser.add_argument("--db-name", default=f"{BENCH_DB_PREFIX}linkandlearnlabs",
+                        help=f"database to drop and seed; must start with {BENCH_DB_PREFIX!r} unless --drop is given")
+    parser.add_argument("--drop", action="store_true",
+                        help="allow dropping a --mongo-url database without the bench prefix")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="fraction of 10k builds / 100k topics / 1M replies to seed")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent async clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured warm-up seconds")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and workload")
+    parser.add_argument("--baseline", help="compare against this stored summary")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression fraction")
+    parser.add_argument("--save-baseline", help="write this run's summary here")
+    sys.exit(asyncio.run(main(parser.parse_args())))
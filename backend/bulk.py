@@ -0,0 +1,115 @@
+import json
+from typing import AsyncIterator, List, Type
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from starlette.requests import Request
+
+
+BULK_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+# Kept from the first import when a later row leaves them out
+INSERT_ONLY_FIELDS = ("created_at",)
+
+
+async def _ndjson_rows(request: Request) -> AsyncIterator[tuple]:
+    """Yield (row number, parsed value or error) from an NDJSON body as it streams in"""
+    buffer = b""
+    row = 0
+
+    def parse(line: bytes):
+        try:
+            return json.loads(line), None
+        except ValueError as e:
+            return None, f"Invalid JSON: {e}"
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                row += 1
+                yield (row, *parse(line))
+    if buffer.strip():
+        row += 1
+        yield (row, *parse(buffer))
+
+
+async def _json_array_rows(request: Request) -> AsyncIterator[tuple]:
+    """Yield (row number, value, None) from a JSON array body"""
+    try:
+        rows = json.loads(await request.body())
+    except ValueError as e:
+        yield 0, None, f"Invalid JSON: {e}"
+        return
+    if not isinstance(rows, list):
+        yield 0, None, "Expected a JSON array"
+        return
+    for row, value in enumerate(rows, start=1):
+        yield row, value, None
+
+
+def request_rows(request: Request) -> AsyncIterator[tuple]:
+    """Pick the row parser from the request content type"""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return _ndjson_rows(request)
+    return _json_array_rows(request)
+
+
+async def bulk_upsert(collection: AsyncIOMotorCollection, model: Type[BaseModel], rows: AsyncIterator[tuple]) -> dict:
+    """Validate rows against ``model`` and upsert them by ``id`` in unordered chunks.
+
+    Every row must carry its ``id``, so importing the same file twice
+    updates rather than duplicates. ``created_at`` is only set on insert
+    unless the row gives one. Invalid rows and rows the database rejects
+    are reported individually; they never stop the rest of the import.
+    """
+    report = {"received": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def fail(row: int, error) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row, "error": error})
+
+    async def write(chunk: List[tuple]) -> None:
+        operations = [UpdateOne({"id": update["$set"]["id"]}, update, upsert=True) for _, update in chunk]
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                fail(chunk[write_error["index"]][0], write_error.get("errmsg", "Write failed"))
+        report["inserted"] += details.get("nUpserted", 0)
+        report["updated"] += details.get("nMatched", 0)
+
+    chunk: List[tuple] = []
+    async for row, value, error in rows:
+        if row:
+            report["received"] += 1
+        if error:
+            fail(row, error)
+            continue
+        if not isinstance(value, dict) or not value.get("id"):
+            fail(row, "Missing 'id'; bulk rows are matched by id")
+            continue
+        try:
+            doc = model.model_validate(value).model_dump()
+        except ValidationError as e:
+            fail(row, e.errors(include_url=False, include_context=False, include_input=False))
+            continue
+        defaults = {field: doc.pop(field) for field in INSERT_ONLY_FIELDS if field in doc and field not in value}
+        update = {"$set": doc}
+        if defaults:
+            update["$setOnInsert"] = defaults
+        chunk.append((row, update))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await write(chunk)
+            chunk = []
+    if chunk:
+        await write(chunk)
+
+    return report
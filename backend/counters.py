@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Write-behind buffer that coalesces hot ``$inc`` updates.
+
+    Increments are summed per (collection, id, field) in memory and written
+    as one unordered ``bulk_write`` per collection. A flush happens every
+    ``flush_interval`` seconds once the oldest pending delta is
+    ``max_staleness`` seconds old, or as soon as ``max_pending`` distinct
+    counters are waiting. Call ``stop()`` on shutdown to flush what is left.
+
+    Deltas being written stay visible to ``merge`` until the write lands,
+    and go back into the buffer if it fails.
+
+    Listeners registered with ``add_flush_listener`` are called with the
+    collection and ids of every batch written, so caches holding copies of
+    those documents can drop them.
+    """
+
+    def __init__(self, flush_interval: float = 1.0, max_staleness: float = 5.0, max_pending: int = 1000):
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self.max_pending = max_pending
+        self.db: Optional[AsyncIOMotorDatabase] = None
+        # (collection, id) -> field -> delta
+        self._pending: Dict[Tuple[str, str], Dict[str, int]] = {}
+        # Deltas taken by a flush whose write has not finished yet
+        self._inflight: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._oldest: Optional[float] = None
+        self._flush_requested = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._eager_flush: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[str, Iterable[str]], None]] = []
+        self.flushes = 0
+        self.writes = 0
+
+    def start(self, db: AsyncIOMotorDatabase) -> None:
+        self.db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def add_flush_listener(self, listener: Callable[[str, Iterable[str]], None]) -> None:
+        self._listeners.append(listener)
+
+    def incr(self, collection: str, doc_id: str, field: str, amount: int = 1) -> None:
+        """Queue an increment of ``field`` on the document with ``id == doc_id``"""
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        fields = self._pending.setdefault((collection, doc_id), {})
+        fields[field] = fields.get(field, 0) + amount
+        if len(self._pending) >= self.max_pending and not self._flush_requested:
+            self._flush_requested = True
+            self._eager_flush = asyncio.create_task(self.flush())
+            self._eager_flush.add_done_callback(self._eager_flush_done)
+
+    def _eager_flush_done(self, task: asyncio.Task) -> None:
+        if self._eager_flush is task:
+            self._eager_flush = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Counter flush failed", exc_info=task.exception())
+
+    def pending(self, collection: str, doc_id: str) -> Dict[str, int]:
+        """Deltas not yet visible in the database for one document, keyed by field"""
+        key = (collection, doc_id)
+        totals = dict(self._inflight.get(key, {}))
+        for field, delta in self._pending.get(key, {}).items():
+            totals[field] = totals.get(field, 0) + delta
+        return {field: delta for field, delta in totals.items() if delta}
+
+    def merge(self, collection: str, doc: Optional[dict]) -> Optional[dict]:
+        """Apply unflushed deltas to a document read from the database"""
+        if doc:
+            for field, delta in self.pending(collection, doc["id"]).items():
+                doc[field] = doc.get(field, 0) + delta
+        return doc
+
+    async def flush(self) -> int:
+        """Write every pending delta; returns the number of documents updated"""
+        async with self._lock:
+            self._flush_requested = False
+            if not self._pending or self.db is None:
+                return 0
+            pending, self._pending = self._pending, {}
+            self._oldest = None
+
+            increments: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(dict)
+            for (collection, doc_id), fields in pending.items():
+                fields = {field: delta for field, delta in fields.items() if delta}
+                if fields:
+                    increments[collection][doc_id] = fields
+                    # Readers keep merging these deltas until their write lands
+                    self._inflight[(collection, doc_id)] = fields
+
+            written = 0
+            try:
+                for collection, documents in increments.items():
+                    operations = [UpdateOne({"id": doc_id}, {"$inc": fields}) for doc_id, fields in documents.items()]
+                    try:
+                        await self.db[collection].bulk_write(operations, ordered=False)
+                    except Exception:
+                        logger.exception(f"Counter flush to {collection} failed; requeueing deltas")
+                        continue
+                    for doc_id in documents:
+                        self._inflight.pop((collection, doc_id), None)
+                    written += len(operations)
+                    for listener in self._listeners:
+                        listener(collection, documents.keys())
+            finally:
+                # Deltas of failed (or cancelled) writes go back to the buffer
+                self._requeue(self._inflight)
+                self._inflight = {}
+
+            self.flushes += 1
+            self.writes += written
+            return written
+
+    def _requeue(self, deltas: Dict[Tuple[str, str], Dict[str, int]]) -> None:
+        """Fold deltas that were not written back into the pending buffer"""
+        for key, fields in deltas.items():
+            requeued = self._pending.setdefault(key, {})
+            for field, delta in fields.items():
+                requeued[field] = requeued.get(field, 0) + delta
+        if deltas and self._oldest is None:
+            self._oldest = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "oldest_pending_seconds": time.monotonic() - self._oldest if self._oldest else 0.0,
+            "flushes": self.flushes,
+            "documents_written": self.writes,
+            "flush_interval": self.flush_interval,
+            "max_staleness": self.max_staleness,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._oldest is not None and time.monotonic() - self._oldest >= self.max_staleness:
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Counter flush failed")
+
+
+counter_buffer = CounterBuffer(
+    flush_interval=float(os.environ.get('COUNTER_FLUSH_INTERVAL', '1')),
+    max_staleness=float(os.environ.get('COUNTER_MAX_STALENESS', '5')),
+    max_pending=int(os.environ.get('COUNTER_MAX_PENDING', '1000')),
+)
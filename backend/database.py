@@ -0,0 +1,58 @@
+import os
+from typing import Mapping, Optional, Union
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+# The smallest maxStalenessSeconds a server accepts
+MIN_MAX_STALENESS = 90
+
+# Environment variable -> (client option, type); unset ones keep the URI or driver default
+POOL_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+    "MONGO_ZLIB_COMPRESSION_LEVEL": ("zlibCompressionLevel", int),
+}
+
+
+def client_options(environ: Mapping[str, str] = os.environ) -> dict:
+    """Connection pool and compression options for the Motor client"""
+    options = {}
+    for variable, (option, cast) in POOL_OPTIONS.items():
+        if environ.get(variable):
+            options[option] = cast(environ[variable])
+    return options
+
+
+def read_preference(mode: str, max_staleness: Optional[int] = None) -> Union[Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest]:
+    """Build a read preference, bounding how far behind a secondary may be"""
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference {mode!r}; expected one of {sorted(READ_PREFERENCES)}")
+    if mode == "primary":
+        return Primary()
+    if max_staleness is not None and max_staleness < MIN_MAX_STALENESS:
+        raise ValueError(f"maxStalenessSeconds must be at least {MIN_MAX_STALENESS}")
+    return READ_PREFERENCES[mode](max_staleness=max_staleness if max_staleness is not None else -1)
+
+
+PUBLIC_READ_MODE = os.environ.get('PUBLIC_READ_PREFERENCE', 'secondaryPreferred')
+PUBLIC_READ_MAX_STALENESS = int(os.environ.get('PUBLIC_READ_MAX_STALENESS', str(MIN_MAX_STALENESS)))
+
+# Anonymous list and detail reads that can tolerate replication lag. Sessions,
+# writes and anything a user reads back right after writing stay on the primary.
+public_read_preference = read_preference(PUBLIC_READ_MODE, PUBLIC_READ_MAX_STALENESS)
+
+# A cached response built from a secondary read may already be stale, so it
+# expires after the staleness bound instead of living until the next write
+PUBLIC_CACHE_TTL = None if PUBLIC_READ_MODE == "primary" else PUBLIC_READ_MAX_STALENESS
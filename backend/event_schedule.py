@@ -0,0 +1,194 @@
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import AsyncIterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+# Cached upcoming/past lists expire so events move to "past" once they start
+LIST_TTL = 60.0
+CALENDAR_PRODID = "-//LinkAndLearnLabs//Events//EN"
+CALENDAR_UID_DOMAIN = "linkandlearnlabs"
+
+# Zone abbreviations used in event times -> UTC offset in hours; anything
+# else must be an IANA name such as "America/New_York"
+ZONE_ABBREVIATIONS = {
+    "UTC": 0, "GMT": 0, "Z": 0,
+    "EST": -5, "EDT": -4,
+    "CST": -6, "CDT": -5,
+    "MST": -7, "MDT": -6,
+    "PST": -8, "PDT": -7,
+}
+# Generic US zone names follow daylight saving, so they map to IANA zones
+ZONE_ALIASES = {
+    "ET": "America/New_York",
+    "CT": "America/Chicago",
+    "MT": "America/Denver",
+    "PT": "America/Los_Angeles",
+}
+# "14:00 EST", "2pm PST", "7:00 PM ET", "9:30 AM America/Chicago", "18:00"
+_TIME = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*(\S+)?\s*$")
+
+
+def _zone(name: Optional[str]) -> Optional[tzinfo]:
+    if not name:
+        return timezone.utc
+    offset = ZONE_ABBREVIATIONS.get(name.upper())
+    if offset is not None:
+        return timezone(timedelta(hours=offset))
+    try:
+        return ZoneInfo(ZONE_ALIASES.get(name.upper(), name))
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def event_start(day: str, time_of_day: str) -> Optional[datetime]:
+    """Naive UTC start of an event from its free-form date and time, or None if unreadable"""
+    try:
+        day = date.fromisoformat(day.strip())
+    except (AttributeError, ValueError):
+        return None
+    match = _TIME.match(time_of_day or "")
+    if not match:
+        return None
+
+    hour, minute, meridiem, zone = match.groups()
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    zone = _zone(zone)
+    if zone is None:
+        return None
+
+    local = datetime(day.year, day.month, day.day, hour, minute, tzinfo=zone)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def with_start(event: dict) -> dict:
+    """A copy of an event document carrying its normalized ``starts_at``"""
+    return {**event, "starts_at": event_start(event.get("date"), event.get("time"))}
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def utc_window(start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Normalize a from/to window to naive UTC, rejecting empty windows"""
+    start, end = _utc(start), _utc(end)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    return start, end
+
+
+def find_events(db: AsyncIOMotorDatabase, projection: dict, upcoming: bool = True,
+                start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 100):
+    """Cursor over events by ``starts_at``.
+
+    A from/to window is returned soonest first; without one, upcoming
+    events come soonest first and past events newest first. Either way the
+    (starts_at, id) index serves the range and the order, so only ``limit``
+    documents are read. Events whose time could not be parsed have no
+    ``starts_at`` and never match.
+    """
+    if start is not None or end is not None:
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start
+        if end is not None:
+            bounds["$lt"] = end
+        direction = 1
+    elif upcoming:
+        bounds, direction = {"$gte": datetime.utcnow()}, 1
+    else:
+        bounds, direction = {"$lt": datetime.utcnow()}, -1
+    return db.events.find({"starts_at": bounds}, projection).sort(
+        [("starts_at", direction), ("id", direction)]
+    ).limit(limit)
+
+
+def _ical_text(value) -> str:
+    text = str(value or "")
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ical_time(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fold(line: str) -> bytes:
+    """Encode a content line, folded at 75 octets without splitting a UTF-8 character"""
+    data = line.encode("utf-8")
+    parts, width = [], 75
+    while len(data) > width:
+        cut = width
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+        width = 74
+    parts.append(data)
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def _vevent(event: dict, stamp: str) -> List[str]:
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{event['id']}@{CALENDAR_UID_DOMAIN}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{_ical_time(event['starts_at'])}",
+        f"SUMMARY:{_ical_text(event.get('title'))}",
+        f"LOCATION:{_ical_text(event.get('location'))}",
+        f"DESCRIPTION:{_ical_text(event.get('description'))}",
+        "END:VEVENT",
+    ]
+
+
+async def ical_lines(cursor, calendar_name: str = "LinkAndLearnLabs Events", chunk_size: int = 100) -> AsyncIterator[bytes]:
+    """Stream a cursor of events as an iCalendar document, a chunk of events at a time"""
+    yield b"".join(_fold(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{CALENDAR_PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_ical_text(calendar_name)}",
+    ])
+    stamp = _ical_time(datetime.utcnow())
+    chunk, pending = [], 0
+    async for event in cursor.batch_size(chunk_size):
+        chunk.extend(_fold(line) for line in _vevent(event, stamp))
+        pending += 1
+        if pending >= chunk_size:
+            yield b"".join(chunk)
+            chunk, pending = [], 0
+    chunk.append(_fold("END:VCALENDAR"))
+    yield b"".join(chunk)
+
+
+async def backfill_event_starts(db: AsyncIOMotorDatabase) -> None:
+    """Set ``starts_at`` on every event from its date and time strings"""
+    operations, unreadable = [], []
+    async for event in db.events.find({}, {"_id": 1, "id": 1, "date": 1, "time": 1}):
+        starts_at = event_start(event.get("date"), event.get("time"))
+        if starts_at is None:
+            unreadable.append(event.get("id"))
+        operations.append(UpdateOne({"_id": event["_id"]}, {"$set": {"starts_at": starts_at}}))
+    if operations:
+        await db.events.bulk_write(operations, ordered=False)
+    if unreadable:
+        logger.warning(f"Could not read a start time for events {unreadable}; they are left out of date queries")
+    logger.info(f"Backfilled starts_at on {len(operations)} events")
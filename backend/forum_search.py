@@ -0,0 +1,233 @@
+import html
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+
+
+# Search documents live in their own collection, one per topic or reply,
+# and are upserted whenever a topic or reply is written
+SEARCH_COLLECTION = "forum_search"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+MIN_TOKEN_LENGTH = 2
+# Shorter query terms would match most of the forum, so they only match whole words
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_LENGTH = 20
+# Only the most recent matches are scored, so a broad query sorts a bounded set
+MAX_CANDIDATES = 1000
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i in is it its of on or "
+    "so that the this to was what when where which who why will with you your".split()
+)
+
+# Score = (1 - RECENCY_WEIGHT) * relevance + RECENCY_WEIGHT * recency, where
+# recency halves every RECENCY_HALF_LIFE_DAYS
+RECENCY_WEIGHT = 0.3
+RECENCY_HALF_LIFE_DAYS = 30.0
+TITLE_BOOST = 1.5
+SNIPPET_LENGTH = 160
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens, without stopwords and very short words"""
+    return [
+        token for token in TOKEN_PATTERN.findall((text or "").lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+def _prefixes(terms: List[str]) -> List[str]:
+    prefixes = set()
+    for term in terms:
+        for end in range(MIN_PREFIX_LENGTH, min(len(term), MAX_PREFIX_LENGTH) + 1):
+            prefixes.add(term[:end])
+    return sorted(prefixes)
+
+
+def _search_document(kind: str, ref_id: str, topic_id: str, title: str, text: str,
+                     category: str, author: str, created_at: datetime) -> dict:
+    terms = sorted(set(tokenize(title) + tokenize(text)))
+    return {
+        "id": f"{kind}:{ref_id}",
+        "kind": kind,
+        "ref_id": ref_id,
+        "topic_id": topic_id,
+        "title": title,
+        "text": text,
+        "category": category,
+        "author": author,
+        "created_at": created_at,
+        "title_terms": sorted(set(tokenize(title))),
+        "terms": terms,
+        "prefixes": _prefixes(terms),
+    }
+
+
+def _topic_document(topic: dict, content: str = "") -> dict:
+    return _search_document("topic", topic["id"], topic["id"], topic["title"], content,
+                            topic["category"], topic["author"], topic["created_at"])
+
+
+def _reply_document(reply: dict, topic: dict) -> dict:
+    return _search_document("reply", reply["id"], topic["id"], topic["title"], reply["content"],
+                            topic["category"], reply["author"], reply["created_at"])
+
+
+async def index_topic(db: AsyncIOMotorDatabase, topic: dict, content: str = "") -> None:
+    """Add or refresh the search entry for a topic"""
+    doc = _topic_document(topic, content)
+    await db[SEARCH_COLLECTION].replace_one({"id": doc["id"]}, doc, upsert=True)
+
+
+async def index_reply(db: AsyncIOMotorDatabase, reply: dict, topic: dict) -> None:
+    """Add or refresh the search entry for a reply"""
+    doc = _reply_document(reply, topic)
+    await db[SEARCH_COLLECTION].replace_one({"id": doc["id"]}, doc, upsert=True)
+
+
+async def _write_batch(db: AsyncIOMotorDatabase, docs: List[dict]) -> int:
+    if docs:
+        await db[SEARCH_COLLECTION].bulk_write(
+            [ReplaceOne({"id": doc["id"]}, doc, upsert=True) for doc in docs], ordered=False
+        )
+    return len(docs)
+
+
+async def backfill_search_index(db: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """Index topics and replies written before search existed; returns the count.
+
+    Both collections are streamed a batch at a time; each batch of replies
+    looks up only the topics it belongs to.
+    """
+    indexed = 0
+    batch = []
+    async for topic in db.forum_topics.find({}, {"_id": 0}).batch_size(batch_size):
+        batch.append(_topic_document(topic))
+        if len(batch) >= batch_size:
+            indexed += await _write_batch(db, batch)
+            batch = []
+    indexed += await _write_batch(db, batch)
+
+    replies = []
+    async for reply in db.forum_replies.find({}, {"_id": 0}).batch_size(batch_size):
+        replies.append(reply)
+        if len(replies) >= batch_size:
+            indexed += await _index_replies(db, replies)
+            replies = []
+    indexed += await _index_replies(db, replies)
+    return indexed
+
+
+async def _index_replies(db: AsyncIOMotorDatabase, replies: List[dict]) -> int:
+    topic_ids = sorted({reply["topic_id"] for reply in replies})
+    topics = {
+        topic["id"]: topic
+        async for topic in db.forum_topics.find({"id": {"$in": topic_ids}}, {"_id": 0, "content": 0})
+    } if topic_ids else {}
+    return await _write_batch(db, [
+        _reply_document(reply, topics[reply["topic_id"]]) for reply in replies if reply["topic_id"] in topics
+    ])
+
+
+def highlight(text: str, query_terms: List[str], length: int = SNIPPET_LENGTH) -> str:
+    """HTML-escaped snippet around the first match, with matches wrapped in <mark>"""
+    text = text or ""
+    start = 0
+    for match in TOKEN_PATTERN.finditer(text.lower() if len(text) > length else ""):
+        if any(match.group().startswith(term) for term in query_terms):
+            start = max(0, match.start() - length // 4)
+            # Start the window on a word boundary
+            start = text.rfind(" ", 0, start) + 1 if start else 0
+            break
+    window = text[start:start + length]
+
+    parts = []
+    position = 0
+    for match in TOKEN_PATTERN.finditer(window.lower()):
+        if any(match.group().startswith(term) for term in query_terms):
+            parts.append(html.escape(window[position:match.start()]))
+            parts.append("<mark>" + html.escape(window[match.start():match.end()]) + "</mark>")
+            position = match.end()
+    parts.append(html.escape(window[position:]))
+
+    snippet = "".join(parts)
+    if start > 0:
+        snippet = "…" + snippet
+    if start + length < len(text):
+        snippet += "…"
+    return snippet
+
+
+def _count_exact(field: str, terms: List[str]) -> dict:
+    """Aggregation expression counting the query terms present in an array field"""
+    return {"$size": {"$filter": {"input": field, "cond": {"$in": ["$$this", terms]}}}}
+
+
+async def search_forum(db: AsyncIOMotorDatabase, query: str, category: Optional[str] = None,
+                       limit: int = 20, offset: int = 0) -> dict:
+    """Rank topics and replies matching every query term.
+
+    Terms of at least ``MIN_PREFIX_LENGTH`` characters match as prefixes,
+    shorter ones as whole words. Only the ``MAX_CANDIDATES`` most recent
+    matches are scored and sorted.
+    """
+    terms = sorted(set(term[:MAX_PREFIX_LENGTH] for term in tokenize(query)))
+    if not terms:
+        return {"results": [], "limit": limit, "offset": offset, "has_more": False}
+
+    match = {}
+    prefixes = [term for term in terms if len(term) >= MIN_PREFIX_LENGTH]
+    words = [term for term in terms if len(term) < MIN_PREFIX_LENGTH]
+    if prefixes:
+        match["prefixes"] = {"$all": prefixes}
+    if words:
+        match["terms"] = {"$all": words}
+    if category:
+        match["category"] = category
+
+    now = datetime.utcnow()
+    pipeline = [
+        {"$match": match},
+        # Served by the (prefixes, created_at) index, so the cap is applied
+        # before anything is sorted in memory
+        {"$sort": {"created_at": -1}},
+        {"$limit": MAX_CANDIDATES},
+        {"$addFields": {
+            # Each term matched at least as a prefix; exact matches and
+            # matches in the topic title count extra
+            "_relevance": {"$divide": [
+                {"$add": [
+                    len(terms),
+                    _count_exact("$terms", terms),
+                    {"$multiply": [TITLE_BOOST, _count_exact("$title_terms", terms)]},
+                ]},
+                len(terms) * (2 + TITLE_BOOST),
+            ]},
+            "_age_days": {"$divide": [{"$subtract": [now, "$created_at"]}, 86400000]},
+        }},
+        {"$addFields": {
+            "score": {"$add": [
+                {"$multiply": [1 - RECENCY_WEIGHT, "$_relevance"]},
+                {"$multiply": [RECENCY_WEIGHT, {"$pow": [0.5, {"$divide": [
+                    {"$max": ["$_age_days", 0]}, RECENCY_HALF_LIFE_DAYS
+                ]}]}]},
+            ]},
+        }},
+        {"$sort": {"score": -1, "created_at": -1, "id": 1}},
+        {"$skip": offset},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0, "terms": 0, "title_terms": 0, "prefixes": 0, "_relevance": 0, "_age_days": 0}},
+    ]
+    hits = await db[SEARCH_COLLECTION].aggregate(pipeline).to_list(limit + 1)
+
+    results = []
+    for hit in hits[:limit]:
+        text = hit.pop("text")
+        hit["title_highlighted"] = highlight(hit["title"], terms, length=max(len(hit["title"]), 1))
+        hit["snippet"] = highlight(text, terms)
+        results.append(hit)
+
+    return {"results": results, "limit": limit, "offset": offset, "has_more": len(hits) > limit}
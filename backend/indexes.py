@@ -0,0 +1,81 @@
+import logging
+from typing import Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+
+logger = logging.getLogger(__name__)
+
+# Index options that change query behaviour and must match the declaration
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _normalize_key(key) -> List[tuple]:
+    return [(field, direction) for field, direction in key.items()] if isinstance(key, dict) else list(key)
+
+
+def _index_drift(declared: dict, existing: dict) -> List[str]:
+    """Describe how an existing index differs from its declaration"""
+    differences = []
+    if _normalize_key(declared["key"]) != _normalize_key(existing["key"]):
+        differences.append(f"key {_normalize_key(existing['key'])} != {_normalize_key(declared['key'])}")
+    for option in COMPARED_OPTIONS:
+        if declared.get(option) != existing.get(option):
+            differences.append(f"{option} {existing.get(option)!r} != {declared.get(option)!r}")
+    return differences
+
+
+async def ensure_collection_indexes(db: AsyncIOMotorDatabase, collection: str, indexes: List[IndexModel]) -> dict:
+    """Create missing declared indexes on one collection and report drift"""
+    existing = await db[collection].index_information()
+    report = {"created": [], "drifted": {}, "undeclared": [], "failed": {}}
+
+    missing = []
+    for index in indexes:
+        declared = index.document
+        name = declared["name"]
+        if name not in existing:
+            missing.append(index)
+            continue
+        differences = _index_drift(declared, existing[name])
+        if differences:
+            report["drifted"][name] = differences
+
+    # One at a time, so an index the existing data violates (e.g. a unique
+    # index over duplicates) does not stop the others or crash startup
+    for index in missing:
+        try:
+            report["created"].extend(await db[collection].create_indexes([index]))
+        except OperationFailure as e:
+            report["failed"][index.document["name"]] = e.details.get("errmsg", str(e)) if e.details else str(e)
+
+    declared_names = {index.document["name"] for index in indexes}
+    report["undeclared"] = sorted(name for name in existing if name != "_id_" and name not in declared_names)
+    return report
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase, declarations: Dict[str, List[IndexModel]]) -> Dict[str, dict]:
+    """Idempotently reconcile every declared index against the database.
+
+    Missing indexes are created. Indexes whose keys or options differ from
+    their declaration, indexes nobody declared, and indexes that could not
+    be built over the existing data are reported but never dropped or
+    forced; fixing those is left to an operator.
+    """
+    reports = {}
+    for collection, indexes in declarations.items():
+        report = await ensure_collection_indexes(db, collection, indexes)
+        reports[collection] = report
+
+        if report["created"]:
+            logger.info(f"Created indexes on {collection}: {', '.join(report['created'])}")
+        for name, differences in report["drifted"].items():
+            logger.warning(f"Index drift on {collection}.{name}: {'; '.join(differences)}")
+        for name, error in report["failed"].items():
+            logger.error(f"Could not create index {collection}.{name}; fix the data and restart: {error}")
+        if report["undeclared"]:
+            logger.warning(f"Undeclared indexes on {collection}: {', '.join(report['undeclared'])}")
+
+    return reports
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+
+logger = logging.getLogger(__name__)
+
+# $changeStream was run against a server that is not a replica set member
+NOT_A_REPLICA_SET = 40573
+# The saved resume point is no longer in the oplog or cannot be used
+RESUME_POINT_LOST = {260, 280, 286}
+# Events that end or replace a whole collection rather than one document
+COLLECTION_EVENTS = {"drop", "rename", "dropDatabase", "invalidate"}
+# Operation sent to handlers when changes may have been missed
+RESYNC = "resync"
+
+TOKENS_COLLECTION = "change_stream_tokens"
+# One {_id: collection, version} document per polled collection, bumped on writes
+VERSIONS_COLLECTION = "cache_versions"
+MODES = ("auto", "change_stream", "poll", "off")
+
+
+class Invalidation(NamedTuple):
+    collection: str
+    # insert, update, replace, delete, or RESYNC for "assume everything changed"
+    operation: str
+    # str() of the changed document's _id; None for a resync
+    doc_id: Optional[str]
+    # The registered fields of the document after the change, when there is one
+    document: Optional[dict]
+
+
+Handler = Callable[[Invalidation], None]
+Poller = Callable[[AsyncIOMotorDatabase], Awaitable[None]]
+
+
+class ChangeWatcher:
+    """Keeps every worker's in-process caches coherent with writes from the others.
+
+    Caches ``register`` a handler per collection. On a replica set one
+    database change stream covers all registered collections and each event
+    is passed to the handlers as an ``Invalidation`` carrying the document
+    id. The resume token is checkpointed to ``change_stream_tokens``, so a
+    restarted watcher continues from where the last one stopped; if that
+    point has left the oplog, every handler gets a ``RESYNC`` instead.
+
+    A standalone server has no change streams. There the watcher polls
+    instead: writers ``publish`` changes to collections registered with
+    ``poll=True``, which bumps their version in ``cache_versions``; each
+    ``poll_interval`` one read of those versions tells every worker which
+    collections to resync. Pollers added with ``add_poller`` run alongside
+    for data nobody publishes.
+    """
+
+    def __init__(self, name: str = "cache_invalidation", mode: str = "auto", poll_interval: float = 5.0,
+                 checkpoint_interval: float = 10.0, retry_interval: float = 5.0, max_await_ms: int = 1000):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache invalidation mode {mode!r}; expected one of {MODES}")
+        self.name = name
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.retry_interval = retry_interval
+        self.max_await_ms = max_await_ms
+        self.db: Optional[AsyncIOMotorDatabase] = None
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._fields: Set[str] = set()
+        self._polled: Set[str] = set()
+        self._pollers: List[Poller] = []
+        self._versions: Dict[str, int] = {}
+        self._token: Optional[dict] = None
+        self._saved_token: Optional[dict] = None
+        self._opened = False
+        self._task: Optional[asyncio.Task] = None
+        self.state = "stopped"
+        self.events = 0
+        self.resyncs = 0
+        self.polls = 0
+        self.errors = 0
+        self.last_event_at: Optional[float] = None
+
+    def register(self, collection: str, handler: Handler, fields: Iterable[str] = (), poll: bool = False) -> None:
+        """Call ``handler`` for every change to ``collection``.
+
+        ``fields`` are copied from the changed document into the event, and
+        ``poll`` opts a collection whose writers ``publish`` into polling.
+        """
+        self._handlers.setdefault(collection, []).append(handler)
+        self._fields.update(fields)
+        if poll:
+            self._polled.add(collection)
+
+    def add_poller(self, poller: Poller) -> None:
+        """Run ``poller(db)`` every poll interval while change streams are unavailable"""
+        self._pollers.append(poller)
+
+    def start(self, db: AsyncIOMotorDatabase) -> None:
+        self.db = db
+        if self._task is None and self.mode != "off":
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._checkpoint()
+        self.state = "stopped"
+
+    async def publish(self, *collections: str) -> None:
+        """Record a write to polled collections so other workers resync them.
+
+        Only needed while polling; change streams see every write already.
+        """
+        if self.state != "polling":
+            return
+        for collection in collections:
+            if collection not in self._polled:
+                continue
+            try:
+                doc = await self.db[VERSIONS_COLLECTION].find_one_and_update(
+                    {"_id": collection}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+                )
+            except Exception:
+                self.errors += 1
+                logger.exception(f"Could not publish a change to {collection}")
+                continue
+            # The writer already dropped its own cache; skip the resync unless
+            # another worker wrote in between
+            if self._versions.get(collection, 0) == doc["version"] - 1:
+                self._versions[collection] = doc["version"]
+
+    def resync(self, collections: Optional[Iterable[str]] = None) -> None:
+        """Tell handlers of ``collections`` (default: all) to drop everything they hold"""
+        self.resyncs += 1
+        for collection in list(collections or self._handlers):
+            self._dispatch(Invalidation(collection, RESYNC, None, None))
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "state": self.state,
+            "collections": sorted(self._handlers),
+            "events": self.events,
+            "resyncs": self.resyncs,
+            "polls": self.polls,
+            "errors": self.errors,
+            "seconds_since_last_event": time.time() - self.last_event_at if self.last_event_at else None,
+        }
+
+    def _dispatch(self, change: Invalidation) -> None:
+        for handler in self._handlers.get(change.collection, ()):
+            try:
+                handler(change)
+            except Exception:
+                logger.exception(f"Cache invalidation handler for {change.collection} failed")
+
+    def apply(self, event: dict) -> None:
+        """Route one change stream event to the handlers of its collection"""
+        self.events += 1
+        self.last_event_at = time.time()
+        operation = event["operationType"]
+        collection = event.get("ns", {}).get("coll")
+        if operation in COLLECTION_EVENTS:
+            self.resync([collection] if collection in self._handlers else None)
+            return
+        doc_id = event.get("documentKey", {}).get("_id")
+        self._dispatch(Invalidation(
+            collection, operation, str(doc_id) if doc_id is not None else None, event.get("fullDocument")
+        ))
+
+    async def _run(self) -> None:
+        if self.mode == "poll":
+            await self._poll_forever()
+            return
+        while True:
+            try:
+                await self._watch()
+                continue
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET and self.mode == "auto":
+                    logger.info(f"MongoDB is not a replica set; polling for cache invalidations every {self.poll_interval}s")
+                    await self._poll_forever()
+                    return
+                if e.code in RESUME_POINT_LOST:
+                    logger.warning(f"Change stream cannot resume ({e.code}); resetting cached data")
+                    # Reopen from now without rereading the saved token; the
+                    # reopen resyncs every handler
+                    self._token = None
+                    self._opened = True
+                    continue
+                self.errors += 1
+                logger.warning(f"Change stream failed: {e}")
+            except Exception:
+                self.errors += 1
+                logger.exception("Change stream failed")
+            self.state = "reconnecting"
+            await asyncio.sleep(self.retry_interval)
+
+    def _pipeline(self) -> List[dict]:
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": {"$in": sorted(self._handlers)}},
+            {"operationType": {"$in": ["dropDatabase", "invalidate"]}},
+        ]}}]
+        if self._fields:
+            pipeline.append({"$project": {
+                "operationType": 1, "ns": 1, "documentKey": 1,
+                **{f"fullDocument.{field}": 1 for field in sorted(self._fields)},
+            }})
+        return pipeline
+
+    async def _watch(self) -> None:
+        if not self._opened and self._token is None:
+            saved = await self.db[TOKENS_COLLECTION].find_one({"_id": self.name})
+            self._token = self._saved_token = saved["resume_token"] if saved else None
+        resumed = self._token is not None
+
+        async with self.db.watch(self._pipeline(), full_document="updateLookup", start_after=self._token,
+                                 max_await_time_ms=self.max_await_ms) as stream:
+            if self._opened and not resumed:
+                # Reopened without a resume point: changes in the gap are lost
+                self.resync()
+            self._opened = True
+            self.state = "change_stream"
+            checkpointed = time.monotonic()
+            while stream.alive:
+                event = await stream.try_next()
+                if event is not None:
+                    self.apply(event)
+                self._token = stream.resume_token
+                if time.monotonic() - checkpointed >= self.checkpoint_interval:
+                    await self._checkpoint()
+                    checkpointed = time.monotonic()
+
+    async def _checkpoint(self) -> None:
+        if self.db is None or self._token is None or self._token == self._saved_token:
+            return
+        try:
+            await self.db[TOKENS_COLLECTION].update_one(
+                {"_id": self.name},
+                {"$set": {"resume_token": self._token, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            self._saved_token = self._token
+        except Exception:
+            logger.exception("Could not save the change stream resume token")
+
+    async def _poll_forever(self) -> None:
+        self.state = "polling"
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                self.errors += 1
+                logger.exception("Cache invalidation poll failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self) -> None:
+        """Resync the polled collections whose version moved and run the pollers once"""
+        versions = {
+            doc["_id"]: doc["version"]
+            async for doc in self.db[VERSIONS_COLLECTION].find({"_id": {"$in": sorted(self._polled)}})
+        }
+        changed = []
+        for collection in sorted(self._polled):
+            version = versions.get(collection, 0)
+            previous = self._versions.get(collection)
+            self._versions[collection] = version
+            if previous is not None and previous != version:
+                changed.append(collection)
+        if changed:
+            self.resync(changed)
+        for poller in self._pollers:
+            await poller(self.db)
+        self.polls += 1
+
+
+change_watcher = ChangeWatcher(
+    mode=os.environ.get('CACHE_INVALIDATION_MODE', 'auto'),
+    poll_interval=float(os.environ.get('CACHE_INVALIDATION_POLL_INTERVAL', '5')),
+    checkpoint_interval=float(os.environ.get('CACHE_INVALIDATION_CHECKPOINT_INTERVAL', '10')),
+    retry_interval=float(os.environ.get('CACHE_INVALIDATION_RETRY_INTERVAL', '5')),
+)
@@ -0,0 +1,198 @@
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+
+from serialization import NO_ID
+from session_cache import session_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Points per unit of each tracked counter
+SCORE_WEIGHTS = {
+    "buildsShared": 25,
+    "coursesCompleted": 50,
+    "enrollments": 5,
+}
+
+# Minimum score per tier, highest first
+RANK_TIERS = [
+    (750, "Platinum"),
+    (300, "Gold"),
+    (100, "Silver"),
+    (0, "Bronze"),
+]
+
+LEADERBOARD_SORT = [("score", -1), ("user_id", 1)]
+# How many entries hold each score; a rank is the sum over the higher scores
+SCORE_COUNTS = "leaderboard_scores"
+
+
+def tier_for(score: int) -> str:
+    for threshold, tier in RANK_TIERS:
+        if score >= threshold:
+            return tier
+    return RANK_TIERS[-1][1]
+
+
+def next_tier(score: int) -> Optional[dict]:
+    """The next tier up and the points still needed to reach it"""
+    for threshold, tier in reversed(RANK_TIERS):
+        if threshold > score:
+            return {"tier": tier, "points_needed": threshold - score}
+    return None
+
+
+def _score(counts: dict) -> int:
+    return sum(SCORE_WEIGHTS[field] * counts.get(field, 0) for field in SCORE_WEIGHTS)
+
+
+async def _set_tier(db: AsyncIOMotorDatabase, user_id: str, tier: str) -> None:
+    await db.leaderboard.update_one({"user_id": user_id}, {"$set": {"tier": tier}})
+    await db.users.update_one({"id": user_id}, {"$set": {"communityRank": tier}})
+    session_cache.invalidate_user(user_id)
+
+
+async def record_activity(db: AsyncIOMotorDatabase, user_id: str, **deltas: int) -> dict:
+    """Apply counter deltas to a user's leaderboard entry.
+
+    One ``$inc`` moves the entry within the (score, user_id) index, so an
+    update costs an index insert rather than a re-sort, and the count of
+    entries at the old and new score moves with it. The user's tier,
+    mirrored into ``users.communityRank``, is only rewritten when the new
+    score crosses a threshold.
+    """
+    unknown = set(deltas) - set(SCORE_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Untracked leaderboard counters: {sorted(unknown)}")
+
+    points = _score(deltas)
+    now = datetime.utcnow()
+    before = await db.leaderboard.find_one_and_update(
+        {"user_id": user_id},
+        {
+            "$inc": {**deltas, "score": points},
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"tier": RANK_TIERS[-1][1]},
+        },
+        projection=NO_ID,
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    entry = dict(before or {"user_id": user_id, "score": 0, "tier": RANK_TIERS[-1][1]})
+    for field, delta in deltas.items():
+        entry[field] = entry.get(field, 0) + delta
+    entry["score"] += points
+    entry["updated_at"] = now
+
+    moves = [UpdateOne({"score": entry["score"]}, {"$inc": {"count": 1}}, upsert=True)]
+    if before is not None:
+        moves.append(UpdateOne({"score": before["score"]}, {"$inc": {"count": -1}}, upsert=True))
+    if before is None or points:
+        await db[SCORE_COUNTS].bulk_write(moves, ordered=False)
+
+    tier = tier_for(entry["score"])
+    if tier != entry.get("tier"):
+        await _set_tier(db, user_id, tier)
+        entry["tier"] = tier
+    return entry
+
+
+async def top(db: AsyncIOMotorDatabase, limit: int = 10) -> List[dict]:
+    """Highest scores first, with each user's public profile fields; tied scores share a rank"""
+    entries = await db.leaderboard.find({}, NO_ID).sort(LEADERBOARD_SORT).limit(limit).to_list(limit)
+    users = await db.users.find(
+        {"id": {"$in": [entry["user_id"] for entry in entries]}},
+        {"_id": 0, "id": 1, "name": 1, "picture": 1}
+    ).to_list(limit)
+    profiles = {user["id"]: user for user in users}
+
+    ranked = []
+    for position, entry in enumerate(entries, start=1):
+        profile = profiles.get(entry["user_id"], {})
+        tied = ranked and ranked[-1]["score"] == entry["score"]
+        ranked.append({
+            "rank": ranked[-1]["rank"] if tied else position,
+            "user_id": entry["user_id"],
+            "name": profile.get("name"),
+            "picture": profile.get("picture"),
+            "score": entry["score"],
+            "tier": entry["tier"],
+        })
+    return ranked
+
+
+async def rank_of(db: AsyncIOMotorDatabase, user_id: str) -> dict:
+    """A user's rank: one more than the number of entries with a higher score.
+
+    Summed from the per-score counts, so the cost grows with the number of
+    distinct higher scores rather than with the rank itself.
+    """
+    entry = await db.leaderboard.find_one({"user_id": user_id}, NO_ID) or {"score": 0}
+    score = entry["score"]
+    ahead = await db[SCORE_COUNTS].aggregate([
+        {"$match": {"score": {"$gt": score}}},
+        {"$group": {"_id": None, "entries": {"$sum": "$count"}}},
+    ]).to_list(1)
+    return {
+        "rank": (ahead[0]["entries"] if ahead else 0) + 1,
+        "score": score,
+        "tier": tier_for(score),
+        "next_tier": next_tier(score),
+        "total": await db.leaderboard.estimated_document_count(),
+    }
+
+
+async def rebuild_leaderboard(db: AsyncIOMotorDatabase) -> None:
+    """Recompute every entry and tier from the users, builds and enrollments.
+
+    Enrollments are counted from ``path_enrollments``, so enrollments made
+    before that collection existed are no longer scored after a rebuild.
+    """
+    async def count_by(collection, field: str) -> dict:
+        pipeline = [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+        return {row["_id"]: row["count"] async for row in collection.aggregate(pipeline)}
+
+    builds_by_user = await count_by(db.builds, "builder_id")
+    enrollments_by_user = await count_by(db.path_enrollments, "user_id")
+
+    entries, ranks = [], []
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "coursesCompleted": 1, "communityRank": 1}):
+        counts = {
+            "buildsShared": builds_by_user.get(user["id"], 0),
+            "coursesCompleted": user.get("coursesCompleted", 0),
+            "enrollments": enrollments_by_user.get(user["id"], 0),
+        }
+        score = _score(counts)
+        tier = tier_for(score)
+        entries.append(UpdateOne(
+            {"user_id": user["id"]},
+            {"$set": {**counts, "score": score, "tier": tier, "updated_at": datetime.utcnow()}},
+            upsert=True
+        ))
+        if user.get("communityRank") != tier:
+            ranks.append(UpdateOne({"id": user["id"]}, {"$set": {"communityRank": tier}}))
+
+    if entries:
+        await db.leaderboard.bulk_write(entries, ordered=False)
+    if ranks:
+        await db.users.bulk_write(ranks, ordered=False)
+        session_cache.clear()
+    await rebuild_score_counts(db)
+    logger.info(f"Rebuilt leaderboard for {len(entries)} users")
+
+
+async def rebuild_score_counts(db: AsyncIOMotorDatabase) -> None:
+    """Recount the entries at each score from the leaderboard itself"""
+    counts = {
+        row["_id"]: row["count"]
+        async for row in db.leaderboard.aggregate([{"$group": {"_id": "$score", "count": {"$sum": 1}}}])
+    }
+    await db[SCORE_COUNTS].delete_many({"score": {"$nin": list(counts)}})
+    if counts:
+        await db[SCORE_COUNTS].bulk_write([
+            UpdateOne({"score": score}, {"$set": {"count": count}}, upsert=True) for score, count in counts.items()
+        ], ordered=False)
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_URL_PREFIX = "/api/media/"
+# Longest edge in pixels for each thumbnail size
+THUMBNAIL_SIZES = {"sm": 320, "md": 640, "lg": 1280}
+# Content-addressed files never change, so clients may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+READ_CHUNK_SIZE = 64 * 1024
+# Enough leading bytes to tell every accepted format apart
+SNIFF_BYTES = 16
+
+# Leading bytes of the formats we accept -> (extension, content type)
+_SIGNATURES = [
+    (b"\xff\xd8\xff", ("jpg", "image/jpeg")),
+    (b"\x89PNG\r\n\x1a\n", ("png", "image/png")),
+    (b"GIF87a", ("gif", "image/gif")),
+    (b"GIF89a", ("gif", "image/gif")),
+]
+_CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+_MEDIA_NAME = re.compile(r"^([0-9a-f]{64})(?:-([a-z]+))?\.(jpg|png|gif|webp)$")
+
+
+def _sniff(head: bytes) -> Optional[Tuple[str, str]]:
+    for signature, kind in _SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    return None
+
+
+def _make_thumbnails(source: str, thumbs_dir: str, digest: str, sizes: Dict[str, int]) -> dict:
+    """Decode an image and write a WebP thumbnail per size; runs in a worker process"""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = 50_000_000
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        for name, edge in sizes.items():
+            target = os.path.join(thumbs_dir, f"{digest}-{name}.webp")
+            if os.path.exists(target):
+                continue
+            thumbnail = image.copy()
+            thumbnail.thumbnail((edge, edge))
+            partial = f"{target}.{uuid.uuid4().hex}.part"
+            thumbnail.save(partial, "WEBP", quality=80, method=4)
+            os.replace(partial, target)
+    return {"width": width, "height": height}
+
+
+class MediaStore:
+    """Content-addressed storage for uploaded images and their thumbnails.
+
+    Uploads stream to a temp file while being hashed, then move to
+    ``originals/<sha256>.<ext>``; a repeat upload of the same bytes lands on
+    the existing file. Thumbnails are decoded and resized in a process pool
+    so image work never runs on the event loop.
+    """
+
+    def __init__(self, root: Path, max_upload_bytes: int, workers: int, sizes: Dict[str, int] = THUMBNAIL_SIZES):
+        self.root = root
+        self.max_upload_bytes = max_upload_bytes
+        self.workers = workers
+        self.sizes = sizes
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        for directory in ("tmp", "originals", "thumbs"):
+            (self.root / directory).mkdir(parents=True, exist_ok=True)
+        if self._pool is None:
+            # Forking would copy Motor's threads and any lock they hold into
+            # the workers; spawned workers start clean
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _original_path(self, digest: str, extension: str) -> Path:
+        return self.root / "originals" / digest[:2] / f"{digest}.{extension}"
+
+    def _thumbs_dir(self, digest: str) -> Path:
+        return self.root / "thumbs" / digest[:2]
+
+    @staticmethod
+    def url(digest: str, extension: str, size: Optional[str] = None) -> str:
+        return f"{MEDIA_URL_PREFIX}{digest}-{size}.{extension}" if size else f"{MEDIA_URL_PREFIX}{digest}.{extension}"
+
+    async def save(self, chunks: AsyncIterator[bytes]) -> dict:
+        """Store an uploaded image and its thumbnails; returns the media document"""
+        temp = self.root / "tmp" / f"{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        kind = None
+
+        def sniff() -> Tuple[str, str]:
+            sniffed = _sniff(head)
+            if sniffed is None:
+                raise HTTPException(status_code=415, detail="Upload a JPEG, PNG, GIF or WebP image")
+            return sniffed
+
+        try:
+            with open(temp, "wb") as out:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if kind is None:
+                        # The first reads may be shorter than a signature
+                        head = (head + chunk)[:SNIFF_BYTES]
+                        if len(head) >= SNIFF_BYTES:
+                            kind = sniff()
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise HTTPException(status_code=413, detail=f"Images are limited to {self.max_upload_bytes} bytes")
+                    digest.update(chunk)
+                    await asyncio.to_thread(out.write, chunk)
+            if not head:
+                raise HTTPException(status_code=400, detail="Empty upload")
+            if kind is None:
+                kind = sniff()
+
+            extension, content_type = kind
+            digest = digest.hexdigest()
+            original = self._original_path(digest, extension)
+            original.parent.mkdir(parents=True, exist_ok=True)
+            created = not original.exists()
+            if created:
+                os.replace(temp, original)
+            else:
+                temp.unlink()
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+
+        thumbs_dir = self._thumbs_dir(digest)
+        thumbs_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            dimensions = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _make_thumbnails, str(original), str(thumbs_dir), digest, self.sizes
+            )
+        except Exception as e:
+            logger.warning(f"Could not thumbnail upload {digest}: {e}")
+            if created:
+                original.unlink(missing_ok=True)
+            raise HTTPException(status_code=415, detail="Unsupported or corrupt image")
+
+        return {
+            "id": digest,
+            "content_type": content_type,
+            "bytes": size,
+            **dimensions,
+            "url": self.url(digest, extension),
+            "thumbnails": {name: self.url(digest, "webp", name) for name in self.sizes},
+        }
+
+    def resolve(self, name: str) -> Tuple[Path, str]:
+        """Map a media file name from a URL to its path and content type"""
+        match = _MEDIA_NAME.match(name)
+        if not match:
+            raise HTTPException(status_code=404, detail="Not found")
+        digest, size, extension = match.groups()
+        if size is not None:
+            if size not in self.sizes or extension != "webp":
+                raise HTTPException(status_code=404, detail="Not found")
+            path = self._thumbs_dir(digest) / name
+        else:
+            path = self._original_path(digest, extension)
+        if not path.is_file():
+            raise HTTPException(status_code=404, detail="Not found")
+        return path, _CONTENT_TYPES[extension]
+
+
+def _parse_range(header: str, length: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range; multi-range requests get the whole file"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), length - 1) if last else length - 1
+    else:
+        start = max(length - int(last), 0)
+        end = length - 1
+    if start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{length}"})
+    return start, end
+
+
+async def _read_file(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    with open(path, "rb") as source:
+        source.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(source.read, min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request: Request, path: Path, content_type: str, etag: str) -> Response:
+    """Serve an immutable file with ETag, conditional GET and single-range support"""
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": f'"{etag}"', "Accept-Ranges": "bytes"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    length = path.stat().st_size
+    byte_range = None
+    if "range" in request.headers and request.headers.get("if-range", headers["ETag"]) == headers["ETag"]:
+        byte_range = _parse_range(request.headers["range"], length)
+
+    if byte_range is None:
+        start, end, status_code = 0, length - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=content_type)
+    return StreamingResponse(_read_file(path, start, end), status_code=status_code,
+                             headers=headers, media_type=content_type)
+
+
+media_store = MediaStore(
+    root=Path(os.environ.get('MEDIA_ROOT', Path(__file__).parent / 'media')),
+    max_upload_bytes=int(os.environ.get('MEDIA_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024))),
+    workers=int(os.environ.get('MEDIA_WORKERS', '2')),
+)
@@ -0,0 +1,278 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.requests import Request
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUNDTRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21)
+# A healthy pool hands out an idle connection in microseconds
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Pymongo monitoring callbacks run on Motor's executor threads
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {labels: (list(entry[0]), entry[1], entry[2]) for labels, entry in self._values.items()}
+        lines = self.header()
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, float]]]) -> None:
+        """Register a callback yielding unlabelled (name, type, help, value) samples at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, documentation, value in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method",)))
+http_request_db_roundtrips = registry.register(Histogram(
+    "http_request_db_roundtrips", "MongoDB commands issued per HTTP request", ("method", "route"),
+    buckets=ROUNDTRIP_BUCKETS))
+mongo_command_duration = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection and operation",
+    ("collection", "command")))
+mongo_command_failures = registry.register(Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands by collection and operation",
+    ("collection", "command")))
+mongo_pool_checkout_wait = registry.register(Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection by server",
+    ("address",), buckets=CHECKOUT_BUCKETS))
+mongo_pool_checkout_failures = registry.register(Counter(
+    "mongo_pool_checkout_failures_total", "Failed connection checkouts by server and reason", ("address", "reason")))
+mongo_pool_checked_out = registry.register(Gauge(
+    "mongo_pool_connections_checked_out", "Pooled connections currently in use by server", ("address",)))
+mongo_pool_connections = registry.register(Gauge(
+    "mongo_pool_connections", "Open pooled connections by server", ("address",)))
+
+
+# Mutable per-request counter; Motor copies the context into its executor
+# threads, so command listeners see the request that issued the command
+_request_roundtrips: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_roundtrips", default=None)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command by collection and operation"""
+
+    def __init__(self):
+        self._started: Dict[tuple, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        # getMore names the cursor id first and the collection separately
+        collection = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        self._started[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+        roundtrips = _request_roundtrips.get()
+        if roundtrips is not None:
+            roundtrips[0] += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        collection = self._started.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(event.duration_micros / 1_000_000, collection, event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        collection = self._started.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(event.duration_micros / 1_000_000, collection, event.command_name)
+        mongo_command_failures.inc(collection, event.command_name)
+
+
+command_timer = CommandTimer()
+
+
+def _address(address) -> str:
+    return "%s:%s" % address
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Measures how long operations wait to check out a pooled connection.
+
+    Checkout starts and finishes on the thread running the operation, so
+    the start time is kept per thread and per server.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _waits(self) -> Dict[str, float]:
+        waits = getattr(self._local, "waits", None)
+        if waits is None:
+            waits = self._local.waits = {}
+        return waits
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        self._waits()[_address(event.address)] = time.perf_counter()
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        address = _address(event.address)
+        started = self._waits().pop(address, None)
+        if started is not None:
+            mongo_pool_checkout_wait.observe(time.perf_counter() - started, address)
+        mongo_pool_checked_out.inc(address)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        address = _address(event.address)
+        started = self._waits().pop(address, None)
+        if started is not None:
+            mongo_pool_checkout_wait.observe(time.perf_counter() - started, address)
+        mongo_pool_checkout_failures.inc(address, event.reason)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        mongo_pool_checked_out.dec(_address(event.address))
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        mongo_pool_connections.inc(_address(event.address))
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        mongo_pool_connections.dec(_address(event.address))
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+
+pool_monitor = PoolMonitor()
+
+
+async def record_request_metrics(request: Request, call_next):
+    """HTTP middleware recording latency, status and DB round-trips per route"""
+    method = request.method
+    roundtrips = [0]
+    token = _request_roundtrips.set(roundtrips)
+    http_requests_in_flight.inc(method)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        http_requests_in_flight.dec(method)
+        _request_roundtrips.reset(token)
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_requests_total.inc(method, route, str(status))
+        http_request_duration.observe(elapsed, method, route)
+        http_request_db_roundtrips.observe(roundtrips[0], method, route)
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from models import EventRegistration
+from forum_search import backfill_search_index
+from leaderboard import rebuild_leaderboard, rebuild_score_counts
+from summaries import rebuild_all_summaries
+from event_schedule import backfill_event_starts, with_start
+from seed_data import learning_paths_data, events_data, affiliate_tools_data, videos_data
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "_migrations"
+# The state document holds the highest applied version; checking it is the
+# only database work a boot does once every migration has run
+STATE_ID = "state"
+LOCK_ID = "lock"
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[AsyncIOMotorDatabase], Awaitable]
+
+
+async def _acquire_lock(db: AsyncIOMotorDatabase, owner: str, ttl: float) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        # Matches a free, expired or already-owned lock; otherwise the upsert
+        # collides with the held lock's _id
+        await db[MIGRATIONS_COLLECTION].update_one(
+            {"_id": LOCK_ID, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def _hold_lock(db: AsyncIOMotorDatabase, owner: str, ttl: float) -> None:
+    """Renew the lock lease until cancelled; returns if the lock was lost"""
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            renewed = await _acquire_lock(db, owner, ttl)
+        except Exception:
+            logger.exception("Could not renew the migration lock")
+            continue
+        if not renewed:
+            logger.error("Lost the migration lock to another worker")
+            return
+
+
+async def _release_lock(db: AsyncIOMotorDatabase, owner: str) -> None:
+    await db[MIGRATIONS_COLLECTION].delete_one({"_id": LOCK_ID, "owner": owner})
+
+
+async def _applied_version(db: AsyncIOMotorDatabase) -> int:
+    state = await db[MIGRATIONS_COLLECTION].find_one({"_id": STATE_ID}, {"version": 1})
+    return state["version"] if state else 0
+
+
+async def run_migrations(
+    db: AsyncIOMotorDatabase,
+    migrations: List[Migration],
+    lock_ttl: float = 60.0,
+    wait_timeout: Optional[float] = None,
+    poll_interval: float = 0.5,
+) -> List[str]:
+    """Apply pending migrations once across every worker starting together.
+
+    One worker takes the lock and applies the pending migrations in version
+    order, recording each one as it completes; a heartbeat renews the lease
+    for as long as that takes. The others wait until the recorded version
+    catches up, taking over if the lease of a dead worker runs out. With a
+    ``wait_timeout``, a worker still waiting after that long raises rather
+    than serve against an unmigrated schema. Returns the names of migrations
+    applied by this worker.
+    """
+    latest = max((migration.version for migration in migrations), default=0)
+    if await _applied_version(db) >= latest:
+        return []
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    deadline = time.monotonic() + wait_timeout if wait_timeout is not None else None
+    while not await _acquire_lock(db, owner, lock_ttl):
+        if await _applied_version(db) >= latest:
+            return []
+        if deadline is not None and time.monotonic() >= deadline:
+            raise RuntimeError(f"Timed out after {wait_timeout}s waiting for migrations to version {latest}")
+        await asyncio.sleep(poll_interval)
+
+    applied = []
+    heartbeat = asyncio.create_task(_hold_lock(db, owner, lock_ttl))
+    try:
+        current = await _applied_version(db)
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if migration.version <= current:
+                continue
+            if heartbeat.done():
+                raise RuntimeError(f"Lost the migration lock before migration {migration.version} {migration.name}")
+            started = time.monotonic()
+            await migration.apply(db)
+            duration = time.monotonic() - started
+
+            await db[MIGRATIONS_COLLECTION].replace_one({"_id": f"v{migration.version:04d}"}, {
+                "version": migration.version,
+                "name": migration.name,
+                "applied_at": datetime.now(timezone.utc),
+                "duration_seconds": duration,
+                "applied_by": owner,
+            }, upsert=True)
+            await db[MIGRATIONS_COLLECTION].update_one(
+                {"_id": STATE_ID}, {"$set": {"version": migration.version}}, upsert=True
+            )
+            applied.append(migration.name)
+            logger.info(f"Applied migration {migration.version} {migration.name} in {duration:.2f}s")
+    finally:
+        heartbeat.cancel()
+        await _release_lock(db, owner)
+
+    return applied
+
+
+# ===== Migrations =====
+
+async def _upsert_seed(db: AsyncIOMotorDatabase, collection: str, documents: List[dict],
+                       counters: tuple = (), timestamps: tuple = ()) -> None:
+    """Idempotently upsert seed documents by id.
+
+    Content fields are overwritten so seed edits reach existing deployments;
+    counters and timestamps are only set when the document is first created.
+    """
+    now = datetime.utcnow()
+    operations = []
+    for doc in documents:
+        content = {key: value for key, value in doc.items() if key not in counters}
+        on_insert = {key: doc[key] for key in counters if key in doc}
+        on_insert.update({key: now for key in timestamps if key not in doc})
+        update = {"$set": content}
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        operations.append(UpdateOne({"id": doc["id"]}, update, upsert=True))
+    if operations:
+        await db[collection].bulk_write(operations, ordered=False)
+
+
+async def seed_catalog(db: AsyncIOMotorDatabase) -> None:
+    """Upsert the seed catalog, one collection per concurrent bulk write"""
+    await asyncio.gather(
+        _upsert_seed(db, "learning_paths", learning_paths_data, counters=("enrolled",)),
+        _upsert_seed(db, "events", [with_start(event) for event in events_data], counters=("attendees",)),
+        _upsert_seed(db, "affiliate_tools", affiliate_tools_data, timestamps=("created_at",)),
+        _upsert_seed(db, "videos", videos_data, timestamps=("created_at",)),
+    )
+
+
+async def move_event_registrations(db: AsyncIOMotorDatabase) -> None:
+    """Move registrations embedded in events into event_registrations"""
+    async for event in db.events.find({"registered_users": {"$exists": True}}, {"id": 1, "registered_users": 1}):
+        registrations = [
+            EventRegistration(event_id=event["id"], user_id=user_id).dict()
+            for user_id in event.get("registered_users") or []
+        ]
+        if registrations:
+            try:
+                await db.event_registrations.insert_many(registrations, ordered=False)
+            except BulkWriteError:
+                pass  # Already moved by an earlier, interrupted run
+        await db.events.update_one({"_id": event["_id"]}, {"$unset": {"registered_users": ""}})
+
+
+async def backfill_forum_search(db: AsyncIOMotorDatabase) -> None:
+    """Index forum content written before search existed"""
+    await backfill_search_index(db)
+
+
+MIGRATIONS = [
+    Migration(1, "seed_catalog", seed_catalog),
+    Migration(2, "move_event_registrations", move_event_registrations),
+    Migration(3, "backfill_forum_search", backfill_forum_search),
+    Migration(4, "build_leaderboard", rebuild_leaderboard),
+    Migration(5, "build_user_summaries", rebuild_all_summaries),
+    Migration(6, "backfill_event_starts", backfill_event_starts),
+    Migration(7, "count_leaderboard_scores", rebuild_score_counts),
+    # Events timed in ET/CT/MT/PT were unreadable before those aliases existed
+    Migration(8, "reparse_event_starts", backfill_event_starts),
+]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from typing import Optional, List, Dict
 from datetime import datetime
 import uuid
 
@@ -36,12 +37,20 @@ class LearningPath(BaseModel):
     enrolled: int = 0
 
 
+class PathEnrollment(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    path_id: str
+    user_id: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class Build(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
     builder: str
     builder_id: str
     image: str
+    thumbnails: Optional[Dict[str, str]] = None
     specs: str
     likes: int = 0
     date: datetime = Field(default_factory=datetime.utcnow)
@@ -49,10 +58,24 @@ class Build(BaseModel):
 
 class BuildCreate(BaseModel):
     title: str
-    image: str
+    # Either an image URL or the id of an image uploaded to /api/builds/images
+    image: Optional[str] = None
+    image_id: Optional[str] = None
     specs: str
 
 
+class MediaFile(BaseModel):
+    id: str  # sha256 of the file contents
+    content_type: str
+    bytes: int
+    width: int
+    height: int
+    url: str
+    thumbnails: Dict[str, str]
+    uploaded_by: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class Event(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -63,7 +86,15 @@ class Event(BaseModel):
     attendees: int = 0
     maxAttendees: int
     description: str
-    registered_users: List[str] = []
+    # UTC start parsed from date and time; None when they could not be read
+    starts_at: Optional[datetime] = None
+
+
+class EventRegistration(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    event_id: str
+    user_id: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class ForumTopic(BaseModel):
@@ -116,4 +147,109 @@ class Video(BaseModel):
     duration: str
     views: str
     platforms: List[str]
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AdmissionPoolLimits(BaseModel):
+    max_concurrent: Optional[int] = Field(None, ge=1)
+    max_queue: Optional[int] = Field(None, ge=0)
+    queue_timeout: Optional[float] = Field(None, gt=0)
+
+
+class AdmissionPools(BaseModel):
+    read: Optional[AdmissionPoolLimits] = None
+    write: Optional[AdmissionPoolLimits] = None
+    auth: Optional[AdmissionPoolLimits] = None
+
+
+class RateLimit(BaseModel):
+    rate: Optional[float] = Field(None, gt=0)
+    burst: Optional[float] = Field(None, ge=1)
+
+
+class RateLimits(BaseModel):
+    ip: Optional[RateLimit] = None
+    user: Optional[RateLimit] = None
+
+
+class AdmissionSettings(BaseModel):
+    pools: Optional[AdmissionPools] = None
+    rate_limits: Optional[RateLimits] = None
+
+
+# ===== Indexes =====
+# Declared per collection next to the models they serve and reconciled
+# at startup by indexes.ensure_indexes.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "sessions": [
+        IndexModel([("session_token", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)]),
+        # TTL index: Mongo removes sessions once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "learning_paths": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "path_enrollments": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("path_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "builds": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("builder_id", ASCENDING), ("date", DESCENDING)]),
+    ],
+    "events": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Upcoming, past and from/to reads walk this index in either direction
+        IndexModel([("starts_at", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "event_registrations": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("event_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "forum_topics": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("lastActivity", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("category", ASCENDING), ("lastActivity", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "forum_replies": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("topic_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "forum_search": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("prefixes", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("terms", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("category", ASCENDING), ("prefixes", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "affiliate_tools": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("featured", DESCENDING)]),
+    ],
+    "leaderboard": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        # Top-N reads walk this index instead of sorting users
+        IndexModel([("score", DESCENDING), ("user_id", ASCENDING)]),
+    ],
+    "leaderboard_scores": [
+        IndexModel([("score", ASCENDING)], unique=True),
+    ],
+    "media": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "user_summaries": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "videos": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+}
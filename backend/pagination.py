@@ -0,0 +1,51 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+
+# Response header carrying the opaque cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, doc_id: str, scope: Optional[str] = None) -> str:
+    """Encode the sort key of the last document on a page as an opaque cursor"""
+    payload = {"v": sort_value.isoformat(), "id": doc_id, "s": scope}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, scope: Optional[str] = None) -> tuple:
+    """Decode a cursor into (sort_value, id), rejecting cursors from another scope"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        sort_value = datetime.fromisoformat(payload["v"])
+        doc_id = str(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if payload.get("s") != scope:
+        raise HTTPException(status_code=400, detail="Cursor does not match this query")
+    return sort_value, doc_id
+
+
+def keyset_filter(field: str, cursor: str, scope: Optional[str] = None, descending: bool = True) -> dict:
+    """Filter selecting documents after the cursor in (field, id) order"""
+    sort_value, doc_id = decode_cursor(cursor, scope)
+    after = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {after: sort_value}},
+        {field: sort_value, "id": {after: doc_id}},
+    ]}
+
+
+def next_cursor(page: List[dict], limit: int, field: str, scope: Optional[str] = None) -> Optional[str]:
+    """Cursor for the page after ``page``, or None when it was the last one"""
+    if len(page) < limit or not page:
+        return None
+    last = page[-1]
+    return encode_cursor(last[field], last["id"], scope)
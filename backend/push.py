@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from serialization import dumps
+
+
+logger = logging.getLogger(__name__)
+
+# Tells a client its view may have missed changes and should be refetched
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+
+
+class Subscriber:
+    def __init__(self, channels: Set[str], queue_size: int):
+        self.channels = channels
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+
+class PushHub:
+    """In-process fan-out of change notifications to Server-Sent Events clients.
+
+    Each published message is encoded once and queued for every subscriber
+    of its channels. Queues are bounded: a client that falls
+    ``queue_size`` messages behind is evicted rather than buffered, and
+    reconnects with ``Last-Event-ID`` to replay what it missed from the
+    last ``replay_size`` messages. Event ids carry a per-process prefix,
+    so an id from before a restart (or from another worker) asks the
+    client to reload instead of silently skipping messages.
+    """
+
+    def __init__(self, queue_size: int = 100, replay_size: int = 1000, max_clients: int = 5000,
+                 heartbeat_interval: float = 15.0, retry_ms: int = 3000):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_ms = retry_ms
+        self._prefix = uuid.uuid4().hex[:8]
+        self._seq = 0
+        # (seq, channels, encoded frame) for Last-Event-ID replay
+        self._replay: deque = deque(maxlen=replay_size)
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._clients = 0
+        self.published = 0
+        self.delivered = 0
+        self.evictions = 0
+
+    def is_full(self) -> bool:
+        return self._clients >= self.max_clients
+
+    def publish(self, channels: Iterable[str], event: str, data) -> None:
+        """Queue ``data`` for every subscriber of any of ``channels``"""
+        channels = set(channels)
+        self._seq += 1
+        frame = f"id: {self._prefix}-{self._seq}\nevent: {event}\ndata: ".encode() + dumps(data) + b"\n\n"
+        self._replay.append((self._seq, channels, frame))
+        self.published += 1
+
+        recipients = set()
+        for channel in channels:
+            recipients.update(self._subscribers.get(channel, ()))
+        for subscriber in recipients:
+            self._offer(subscriber, frame)
+
+    def _offer(self, subscriber: Subscriber, frame: Optional[bytes]) -> None:
+        if subscriber.evicted:
+            return
+        try:
+            subscriber.queue.put_nowait(frame)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            # A slow consumer must not hold memory or delay everyone else
+            subscriber.evicted = True
+            self.evictions += 1
+            logger.info(f"Evicted a push subscriber {self.queue_size} messages behind on {sorted(subscriber.channels)}")
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def subscribe(self, channels: Set[str], last_event_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(channels, self.queue_size)
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        self._clients += 1
+
+        if last_event_id:
+            missed = self._missed(channels, last_event_id)
+            if len(missed) >= self.queue_size:
+                # Replaying would evict the client straight away
+                missed = [RESET_FRAME]
+            for frame in missed:
+                self._offer(subscriber, frame)
+        return subscriber
+
+    def _missed(self, channels: Set[str], last_event_id: str) -> List[bytes]:
+        prefix, _, seq = last_event_id.partition("-")
+        oldest = self._replay[0][0] if self._replay else self._seq + 1
+        if prefix != self._prefix or not seq.isdigit() or int(seq) + 1 < oldest:
+            # The gap cannot be replayed; the client should refetch its view
+            return [RESET_FRAME]
+        last = int(seq)
+        return [frame for seq, frame_channels, frame in self._replay
+                if seq > last and frame_channels & channels]
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for channel in subscriber.channels:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+        self._clients -= 1
+
+    async def stream(self, channels: Set[str], last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Subscribe and yield SSE frames until closed, with heartbeats while idle.
+
+        Subscribing inside the generator ties the subscription to the
+        response body, so it is released however the stream ends.
+        """
+        subscriber = self.subscribe(channels, last_event_id)
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle stream
+                    yield b": heartbeat\n\n"
+                    continue
+                if frame is None:
+                    if subscriber.evicted:
+                        yield b"event: evicted\ndata: {}\n\n"
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def close(self) -> None:
+        """End every open stream, e.g. on shutdown"""
+        for subscriber in {s for subscribers in self._subscribers.values() for s in subscribers}:
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "clients": self._clients,
+            "channels": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evictions": self.evictions,
+            "replay_buffer": len(self._replay),
+        }
+
+
+push_hub = PushHub(
+    queue_size=int(os.environ.get('PUSH_QUEUE_SIZE', '100')),
+    replay_size=int(os.environ.get('PUSH_REPLAY_SIZE', '1000')),
+    max_clients=int(os.environ.get('PUSH_MAX_CLIENTS', '5000')),
+    heartbeat_interval=float(os.environ.get('PUSH_HEARTBEAT_INTERVAL', '15')),
+)
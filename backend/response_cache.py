@@ -0,0 +1,104 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from serialization import dumps
+
+
+class ResponseCache:
+    """Versioned in-memory cache of encoded JSON responses.
+
+    Each cached body belongs to a namespace (usually a collection). Writes
+    call ``bump(namespace)`` which moves the namespace to a new version, so
+    every entry built from the old data stops matching without having to
+    find and delete it. Entries given a ``ttl`` also expire on their own,
+    for bodies loaded from a replica that may lag behind the last write.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[Tuple[str, Hashable], tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, *namespaces: str) -> None:
+        """Invalidate every cached response in the given namespaces"""
+        for namespace in namespaces:
+            self._versions[namespace] = self.version(namespace) + 1
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        entry = self._entries.get((namespace, key))
+        if entry is None or entry[0] != self.version(namespace):
+            self.misses += 1
+            return None
+        version, body, etag, deadline = entry
+        if deadline is not None and deadline <= time.monotonic():
+            del self._entries[(namespace, key)]
+            self.misses += 1
+            return None
+        self._entries.move_to_end((namespace, key))
+        self.hits += 1
+        return body, etag
+
+    def set(self, namespace: str, key: Hashable, version: int, body: bytes, ttl: Optional[float] = None) -> str:
+        """Store an encoded body and return its strong ETag"""
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # A write that raced with the load already bumped the version; keep the
+        # stale body out of the cache
+        if version == self.version(namespace):
+            deadline = time.monotonic() + ttl if ttl is not None else None
+            self._entries[(namespace, key)] = (version, body, etag, deadline)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "versions": dict(self._versions),
+        }
+
+    async def respond(self, request: Request, namespace: str, key: Hashable, load: Callable[[], Awaitable],
+                      ttl: Optional[float] = None) -> Response:
+        """Serve a cached JSON body, loading it on a miss, with ETag/304 support"""
+        cached = self.get(namespace, key)
+        if cached is None:
+            version = self.version(namespace)
+            body = dumps(await load())
+            etag = self.set(namespace, key, version, body, ttl)
+        else:
+            body, etag = cached
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+response_cache = ResponseCache()
@@ -49,8 +49,7 @@ events_data = [
         "image": "https://images.pexels.com/photos/3184639/pexels-photo-3184639.jpeg",
         "attendees": 0,
         "maxAttendees": 50,
-        "description": "Join us for a live PC building session where we assemble a complete gaming rig",
-        "registered_users": []
+        "description": "Join us for a live PC building session where we assemble a complete gaming rig"
     },
     {
         "id": "2",
@@ -61,8 +60,7 @@ events_data = [
         "image": "https://images.pexels.com/photos/1181622/pexels-photo-1181622.jpeg",
         "attendees": 0,
         "maxAttendees": 100,
-        "description": "Bring your PC problems and get expert advice from our community",
-        "registered_users": []
+        "description": "Bring your PC problems and get expert advice from our community"
     }
 ]
 
@@ -0,0 +1,57 @@
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+
+# Projection for trusted reads: drop Mongo's ObjectId at query time instead of
+# walking every returned document in Python
+NO_ID = {"_id": 0}
+
+
+def _default(obj: Any):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content straight to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response for documents read from our own collections.
+
+    Returning a Response instance makes FastAPI skip ``response_model``
+    validation, so only use this for data that was validated on write.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def ndjson_lines(cursor, chunk_size: int = 500) -> AsyncIterator[bytes]:
+    """Stream a Motor cursor as NDJSON, one chunk of lines at a time.
+
+    The cursor is consumed in ``chunk_size`` batches so memory stays flat
+    however many documents it yields.
+    """
+    lines = []
+    async for doc in cursor.batch_size(chunk_size):
+        lines.append(dumps(doc))
+        if len(lines) >= chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
@@ -1,36 +1,45 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Response, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
 from pathlib import Path
 from typing import List, Optional
 from datetime import datetime, timezone
-from bson import ObjectId
 
 from models import (
-    User, Session, SessionCreate, LearningPath, Build, BuildCreate,
-    Event, ForumTopic, ForumTopicCreate, ForumReply, AffiliateTool, Video
+    User, Session, SessionCreate, LearningPath, Build, BuildCreate, MediaFile,
+    PathEnrollment, Event, EventRegistration, ForumTopic, ForumTopicCreate, ForumReply, AffiliateTool, Video, AdmissionSettings, INDEXES
 )
-from auth import exchange_session_id, get_current_user, create_or_update_user, create_session
-from seed_data import learning_paths_data, events_data, affiliate_tools_data, videos_data
-
-
-# Custom JSON encoder for MongoDB ObjectId
-class MongoJSONEncoder:
-    @staticmethod
-    def convert_objectid(obj):
-        """Convert MongoDB documents with ObjectId to JSON-serializable format"""
-        if isinstance(obj, list):
-            return [MongoJSONEncoder.convert_objectid(item) for item in obj]
-        elif isinstance(obj, dict):
-            return {key: MongoJSONEncoder.convert_objectid(value) for key, value in obj.items()}
-        elif isinstance(obj, ObjectId):
-            return str(obj)
-        return obj
+from auth import (
+    auth_provider, exchange_session_id, get_current_user, get_optional_user, require_admin, require_metrics_access,
+    create_or_update_user, create_session, verify_cached_sessions
+)
+from session_cache import session_cache
+from indexes import ensure_indexes
+from serialization import NO_ID, FastJSONResponse, ndjson_lines
+from response_cache import response_cache
+from pagination import NEXT_CURSOR_HEADER, keyset_filter, next_cursor
+from counters import counter_buffer
+from bulk import bulk_upsert, request_rows
+from forum_search import index_reply, index_topic, search_forum
+from migrations import MIGRATIONS, run_migrations
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, command_timer, pool_monitor, record_request_metrics, registry
+from database import PUBLIC_CACHE_TTL, client_options, public_read_preference
+from slow_queries import slow_query_log
+from admission import admission
+import leaderboard
+import summaries
+import event_schedule
+from push import push_hub
+from media import file_response, media_store
+from invalidation import RESYNC, change_watcher
 
 
 ROOT_DIR = Path(__file__).parent
@@ -38,8 +47,11 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[command_timer, pool_monitor, slow_query_log], **client_options())
 db = client[os.environ['DB_NAME']]
+# Public reads that tolerate replication lag; auth, writes and pages users
+# read back straight after writing use `db`, which stays on the primary
+public_db = db.with_options(read_preference=public_read_preference)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -48,29 +60,111 @@ app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 
-# ===== Startup Event - Seed Data =====
+def _cache_metrics():
+    sessions = session_cache.stats()
+    responses = response_cache.stats()
+    counters = counter_buffer.stats()
+    yield "session_cache_hits_total", "counter", "Session cache hits", sessions["hits"]
+    yield "session_cache_misses_total", "counter", "Session cache misses", sessions["misses"]
+    yield "session_cache_entries", "gauge", "Sessions currently cached", sessions["size"]
+    yield "response_cache_hits_total", "counter", "Response cache hits", responses["hits"]
+    yield "response_cache_misses_total", "counter", "Response cache misses", responses["misses"]
+    yield "response_cache_not_modified_total", "counter", "Responses answered with 304", responses["not_modified"]
+    yield "counter_buffer_pending", "gauge", "Documents with unflushed counter deltas", counters["pending"]
+    push = push_hub.stats()
+    yield "push_clients", "gauge", "Open Server-Sent Events streams", push["clients"]
+    yield "push_evictions_total", "counter", "Streams closed for falling behind", push["evictions"]
+    watcher = change_watcher.stats()
+    yield "cache_invalidation_events_total", "counter", "Change events applied to local caches", watcher["events"]
+    yield "cache_invalidation_resyncs_total", "counter", "Full cache resets after missed or unknown changes", watcher["resyncs"]
+
+
+registry.add_collector(_cache_metrics)
+
+
+# ===== Startup Event - Slow Query Log =====
+@app.on_event("startup")
+async def startup_slow_query_log():
+    """Let the slow query log run explain() on the app's event loop"""
+    slow_query_log.start(client)
+
+
+# ===== Startup Event - Indexes =====
+@app.on_event("startup")
+async def startup_indexes():
+    """Create declared indexes and record any drift"""
+    app.state.index_report = await ensure_indexes(db, INDEXES)
+
+
+# ===== Startup Event - Auth Provider Client =====
+@app.on_event("startup")
+async def startup_auth_provider():
+    """Open the pooled auth provider client"""
+    await auth_provider.start()
+
+
+# ===== Startup Event - Counter Buffer =====
+@app.on_event("startup")
+async def startup_counter_buffer():
+    """Start the write-behind flusher for hot counters"""
+    def invalidate_flushed_users(collection, user_ids):
+        if collection == "users":
+            for user_id in user_ids:
+                session_cache.invalidate_user(user_id)
+    
+    counter_buffer.add_flush_listener(invalidate_flushed_users)
+    counter_buffer.start(db)
+
+
+# ===== Startup Event - Cache Invalidation =====
+async def catalog_changed(*collections: str) -> None:
+    """Drop this worker's cached responses for a write, and tell the other workers"""
+    response_cache.bump(*collections)
+    await change_watcher.publish(*collections)
+
+
 @app.on_event("startup")
-async def startup_seed_data():
-    """Seed initial data if collections are empty"""
-    # Seed learning paths
-    if await db.learning_paths.count_documents({}) == 0:
-        await db.learning_paths.insert_many(learning_paths_data)
-        logging.info("Seeded learning paths")
+async def startup_change_watcher():
+    """Invalidate this worker's caches when any worker writes"""
+    def bump_responses(change):
+        response_cache.bump(change.collection)
     
-    # Seed events
-    if await db.events.count_documents({}) == 0:
-        await db.events.insert_many(events_data)
-        logging.info("Seeded events")
+    def drop_session(change):
+        if change.operation == RESYNC:
+            session_cache.clear()
+        elif change.operation != "insert":
+            session_cache.invalidate_session(change.doc_id)
     
-    # Seed affiliate tools
-    if await db.affiliate_tools.count_documents({}) == 0:
-        await db.affiliate_tools.insert_many(affiliate_tools_data)
-        logging.info("Seeded affiliate tools")
+    def drop_user(change):
+        if change.operation == "insert":
+            return
+        user_id = (change.document or {}).get("id")
+        if user_id:
+            session_cache.invalidate_user(user_id)
+        else:
+            # Deletes and resyncs do not say which user id changed
+            session_cache.clear()
     
-    # Seed videos
-    if await db.videos.count_documents({}) == 0:
-        await db.videos.insert_many(videos_data)
-        logging.info("Seeded videos")
+    for collection in ("learning_paths", "events", "affiliate_tools", "videos"):
+        change_watcher.register(collection, bump_responses, poll=True)
+    change_watcher.register("sessions", drop_session)
+    change_watcher.register("users", drop_user, fields=["id"])
+    change_watcher.add_poller(verify_cached_sessions)
+    change_watcher.start(db)
+
+
+# ===== Startup Event - Media Store =====
+@app.on_event("startup")
+async def startup_media_store():
+    """Create the media directories and the thumbnailing process pool"""
+    media_store.start()
+
+
+# ===== Startup Event - Migrations =====
+@app.on_event("startup")
+async def startup_migrations():
+    """Apply pending seed and data migrations"""
+    await run_migrations(db, MIGRATIONS)
 
 
 # ===== Authentication Routes =====
@@ -100,6 +194,8 @@ async def create_auth_session(session_data: SessionCreate, response: Response):
         
         return {"user": user, "session_token": emergent_data["session_token"]}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Session creation error: {str(e)}")
         raise HTTPException(status_code=401, detail=str(e))
@@ -116,6 +212,7 @@ async def logout(response: Response, current_user: dict = Depends(get_current_us
     """Logout user and clear session"""
     # Delete session from database
     await db.sessions.delete_many({"user_id": current_user["id"]})
+    session_cache.invalidate_user(current_user["id"])
     
     # Clear cookie
     response.delete_cookie(key="session_token", path="/")
@@ -125,131 +222,286 @@ async def logout(response: Response, current_user: dict = Depends(get_current_us
 
 # ===== Learning Paths Routes =====
 @api_router.get("/learning-paths", response_model=List[LearningPath])
-async def get_learning_paths():
+async def get_learning_paths(request: Request):
     """Get all learning paths"""
-    paths = await db.learning_paths.find().to_list(1000)
-    paths = MongoJSONEncoder.convert_objectid(paths)
-    return paths
+    async def load():
+        return await public_db.learning_paths.find({}, NO_ID).to_list(1000)
+    
+    return await response_cache.respond(request, "learning_paths", "all", load, PUBLIC_CACHE_TTL)
 
 
 @api_router.get("/learning-paths/{path_id}")
 async def get_learning_path(path_id: str):
     """Get single learning path"""
-    path = await db.learning_paths.find_one({"id": path_id})
+    path = await public_db.learning_paths.find_one({"id": path_id}, NO_ID)
     if not path:
         raise HTTPException(status_code=404, detail="Learning path not found")
-    return MongoJSONEncoder.convert_objectid(path)
+    return path
 
 
 @api_router.post("/learning-paths/{path_id}/enroll")
 async def enroll_learning_path(path_id: str, current_user: dict = Depends(get_current_user)):
     """Enroll in a learning path"""
-    path = await db.learning_paths.find_one({"id": path_id})
-    if not path:
-        raise HTTPException(status_code=404, detail="Learning path not found")
+    # The unique (path_id, user_id) index rejects duplicate enrollments
+    enrollment = PathEnrollment(path_id=path_id, user_id=current_user["id"])
+    try:
+        await db.path_enrollments.insert_one(enrollment.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Already enrolled")
     
-    # Increment enrolled count
-    await db.learning_paths.update_one(
+    # Increment enrolled count and return the updated path in one round-trip
+    updated_path = await db.learning_paths.find_one_and_update(
         {"id": path_id},
-        {"$inc": {"enrolled": 1}}
+        {"$inc": {"enrolled": 1}},
+        projection=NO_ID,
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_path:
+        await db.path_enrollments.delete_one({"id": enrollment.id})
+        raise HTTPException(status_code=404, detail="Learning path not found")
     
-    updated_path = await db.learning_paths.find_one({"id": path_id})
+    await catalog_changed("learning_paths")
+    await leaderboard.record_activity(db, current_user["id"], enrollments=1)
+    await summaries.record_activity(
+        db, current_user["id"], "enroll", path_id, updated_path["title"],
+        {"path_id": path_id, "title": updated_path["title"], "enrolled_at": enrollment.created_at}
+    )
     return updated_path
 
 
 # ===== Builds Routes =====
 @api_router.get("/builds", response_model=List[Build])
-async def get_builds(limit: int = 10, offset: int = 0):
-    """Get featured builds"""
-    builds = await db.builds.find().sort("date", -1).skip(offset).limit(limit).to_list(limit)
-    return MongoJSONEncoder.convert_objectid(builds)
+async def get_builds(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0), cursor: Optional[str] = None):
+    """Get featured builds, paged by cursor (or by the legacy offset)"""
+    query = keyset_filter("date", cursor) if cursor else {}
+    
+    builds_cursor = db.builds.find(query, NO_ID).sort([("date", -1), ("id", -1)])
+    if not cursor and offset:
+        builds_cursor = builds_cursor.skip(offset)
+    builds = await builds_cursor.limit(limit).to_list(limit)
+    for build in builds:
+        counter_buffer.merge("builds", build)
+        # Builds created from an image URL have no thumbnails
+        build.setdefault("thumbnails", None)
+    
+    response = FastJSONResponse(builds)
+    token = next_cursor(builds, limit, "date")
+    if token:
+        response.headers[NEXT_CURSOR_HEADER] = token
+    return response
 
 
 @api_router.post("/builds", response_model=Build)
 async def create_build(build_data: BuildCreate, current_user: dict = Depends(get_current_user)):
     """Create a new build"""
+    image, thumbnails = build_data.image, None
+    if build_data.image_id:
+        media = await db.media.find_one({"id": build_data.image_id}, NO_ID)
+        if not media:
+            raise HTTPException(status_code=400, detail="Unknown image_id")
+        image, thumbnails = media["url"], media["thumbnails"]
+    if not image:
+        raise HTTPException(status_code=400, detail="Provide an image URL or an uploaded image_id")
+    
     build = Build(
         title=build_data.title,
         builder=current_user["name"],
         builder_id=current_user["id"],
-        image=build_data.image,
+        image=image,
+        thumbnails=thumbnails,
         specs=build_data.specs
     )
     
     await db.builds.insert_one(build.dict())
     
-    # Increment user's buildsShared count
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$inc": {"buildsShared": 1}}
-    )
+    # Increment user's buildsShared count (written behind)
+    counter_buffer.incr("users", current_user["id"], "buildsShared")
+    session_cache.invalidate_user(current_user["id"])
+    await leaderboard.record_activity(db, current_user["id"], buildsShared=1)
+    await summaries.record_activity(db, current_user["id"], "build", build.id, build.title)
     
     return build
 
 
+@api_router.post("/builds/images", response_model=MediaFile)
+async def upload_build_image(request: Request, current_user: dict = Depends(get_current_user)):
+    """Upload a build image as the raw request body; returns its URL and thumbnail URLs"""
+    saved = await media_store.save(request.stream())
+    media = MediaFile(**saved, uploaded_by=current_user["id"])
+    # Identical bytes share one document and one set of files
+    await db.media.update_one({"id": media.id}, {"$setOnInsert": media.dict()}, upsert=True)
+    return media
+
+
+@api_router.api_route("/media/{name}", methods=["GET", "HEAD"])
+async def get_media(name: str, request: Request):
+    """Serve an uploaded image or thumbnail; content-addressed, so cached for a year"""
+    path, content_type = media_store.resolve(name)
+    return file_response(request, path, content_type, etag=name.split(".")[0])
+
+
 @api_router.post("/builds/{build_id}/like")
 async def like_build(build_id: str, current_user: dict = Depends(get_current_user)):
     """Like a build"""
-    build = await db.builds.find_one({"id": build_id})
+    build = await db.builds.find_one({"id": build_id}, NO_ID)
     if not build:
         raise HTTPException(status_code=404, detail="Build not found")
     
-    await db.builds.update_one(
-        {"id": build_id},
-        {"$inc": {"likes": 1}}
-    )
-    
-    updated_build = await db.builds.find_one({"id": build_id})
-    return updated_build
+    # Likes on a viral build all hit one document; coalesce them
+    counter_buffer.incr("builds", build_id, "likes")
+    await summaries.record_activity(db, current_user["id"], "like", build_id, build["title"])
+    return counter_buffer.merge("builds", build)
+
+
+# ===== Leaderboard Routes =====
+@api_router.get("/leaderboard")
+async def get_leaderboard(limit: int = Query(10, ge=1, le=100)):
+    """Get the top community members by score"""
+    return FastJSONResponse(await leaderboard.top(public_db, limit))
+
+
+@api_router.get("/leaderboard/me")
+async def get_my_rank(current_user: dict = Depends(get_current_user)):
+    """Get the current user's rank, score and progress to the next tier"""
+    return await leaderboard.rank_of(db, current_user["id"])
+
+
+# ===== User Summary Routes =====
+@api_router.get("/users/me/summary")
+async def get_my_summary(current_user: dict = Depends(get_current_user)):
+    """Get the current user's dashboard summary: counts, enrolled paths, events and recent activity"""
+    return FastJSONResponse(await summaries.get_summary(db, current_user["id"]))
 
 
 # ===== Events Routes =====
+# Public event fields; attendee identities live in event_registrations
+EVENT_FIELDS = {"_id": 0, "registered_users": 0}
+
+
 @api_router.get("/events", response_model=List[Event])
-async def get_events(upcoming: bool = True):
-    """Get events"""
-    events = await db.events.find().to_list(1000)
-    return MongoJSONEncoder.convert_objectid(events)
+async def get_events(
+    request: Request,
+    upcoming: bool = True,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Get upcoming events soonest first, past events newest first, or the events in a from/to window"""
+    start, end = event_schedule.utc_window(start, end)
+    
+    async def load():
+        return await event_schedule.find_events(public_db, EVENT_FIELDS, upcoming, start, end, limit).to_list(limit)
+    
+    if start or end:
+        return FastJSONResponse(await load())
+    ttl = min(event_schedule.LIST_TTL, PUBLIC_CACHE_TTL or event_schedule.LIST_TTL)
+    return await response_cache.respond(request, "events", (upcoming, limit), load, ttl)
+
+
+@api_router.get("/events/calendar.ics")
+async def get_events_calendar(
+    upcoming: bool = True,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Stream the events /events would return as an iCalendar feed"""
+    start, end = event_schedule.utc_window(start, end)
+    events = event_schedule.find_events(public_db, EVENT_FIELDS, upcoming, start, end, limit)
+    return StreamingResponse(
+        event_schedule.ical_lines(events),
+        media_type="text/calendar; charset=utf-8",
+        headers={"Content-Disposition": 'inline; filename="events.ics"'}
+    )
+
+
+@api_router.get("/events/registrations/me", response_model=List[Event])
+async def get_my_registrations(current_user: dict = Depends(get_current_user)):
+    """Get the events the current user registered for, most recent first"""
+    registrations = await db.event_registrations.find(
+        {"user_id": current_user["id"]}, {"_id": 0, "event_id": 1}
+    ).sort("created_at", -1).to_list(1000)
+    event_ids = [registration["event_id"] for registration in registrations]
+    
+    events = await db.events.find({"id": {"$in": event_ids}}, EVENT_FIELDS).to_list(len(event_ids))
+    events_by_id = {event["id"]: event for event in events}
+    return FastJSONResponse([events_by_id[event_id] for event_id in event_ids if event_id in events_by_id])
 
 
 @api_router.post("/events/{event_id}/register")
 async def register_event(event_id: str, current_user: dict = Depends(get_current_user)):
     """Register for an event"""
-    event = await db.events.find_one({"id": event_id})
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    # Check if already registered
-    if current_user["id"] in event.get("registered_users", []):
+    # The unique (event_id, user_id) index rejects duplicate registrations
+    registration = EventRegistration(event_id=event_id, user_id=current_user["id"])
+    try:
+        await db.event_registrations.insert_one(registration.dict())
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Already registered")
     
-    # Check if event is full
-    if event["attendees"] >= event["maxAttendees"]:
+    # The capacity check lives in the filter, so concurrent registrations
+    # can never oversell an event. The pre-image is returned because the
+    # post-image of the last seat no longer matches that filter.
+    updated_event = await db.events.find_one_and_update(
+        {"id": event_id, "$expr": {"$lt": ["$attendees", "$maxAttendees"]}},
+        {"$inc": {"attendees": 1}},
+        projection=EVENT_FIELDS,
+        return_document=ReturnDocument.BEFORE
+    )
+    
+    if not updated_event:
+        await db.event_registrations.delete_one({"id": registration.id})
+        if not await db.events.count_documents({"id": event_id}, limit=1):
+            raise HTTPException(status_code=404, detail="Event not found")
         raise HTTPException(status_code=400, detail="Event is full")
+    updated_event["attendees"] += 1
     
-    # Register user
-    await db.events.update_one(
-        {"id": event_id},
-        {
-            "$inc": {"attendees": 1},
-            "$push": {"registered_users": current_user["id"]}
-        }
+    await catalog_changed("events")
+    push_hub.publish([f"event:{event_id}"], "attendance", {
+        "event_id": event_id, "attendees": updated_event["attendees"], "maxAttendees": updated_event["maxAttendees"]
+    })
+    await summaries.record_activity(
+        db, current_user["id"], "register", event_id, updated_event["title"],
+        {"event_id": event_id, "title": updated_event["title"], "date": updated_event["date"],
+         "registered_at": registration.created_at}
     )
-    
-    updated_event = await db.events.find_one({"id": event_id})
     return updated_event
 
 
 # ===== Forum Routes =====
 @api_router.get("/forum/topics", response_model=List[ForumTopic])
-async def get_forum_topics(category: Optional[str] = None, limit: int = 20, offset: int = 0):
-    """Get forum topics"""
-    query = {}
+async def get_forum_topics(
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None
+):
+    """Get forum topics, paged by cursor (or by the legacy offset)"""
+    # Cursors are scoped to the category they were issued for
+    query = keyset_filter("lastActivity", cursor, category) if cursor else {}
     if category:
         query["category"] = category
     
-    topics = await db.forum_topics.find(query).sort("lastActivity", -1).skip(offset).limit(limit).to_list(limit)
-    return MongoJSONEncoder.convert_objectid(topics)
+    topics_cursor = db.forum_topics.find(query, NO_ID).sort([("lastActivity", -1), ("id", -1)])
+    if not cursor and offset:
+        topics_cursor = topics_cursor.skip(offset)
+    topics = await topics_cursor.limit(limit).to_list(limit)
+    
+    response = FastJSONResponse(topics)
+    token = next_cursor(topics, limit, "lastActivity", category)
+    if token:
+        response.headers[NEXT_CURSOR_HEADER] = token
+    return response
+
+
+@api_router.get("/forum/search")
+async def search_forum_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000)
+):
+    """Search topic titles and reply content, ranked by relevance and recency"""
+    return FastJSONResponse(await search_forum(public_db, q, category, limit, offset))
 
 
 @api_router.post("/forum/topics", response_model=ForumTopic)
@@ -263,9 +515,54 @@ async def create_forum_topic(topic_data: ForumTopicCreate, current_user: dict =
     )
     
     await db.forum_topics.insert_one(topic.dict())
+    await index_topic(db, topic.dict(), topic_data.content)
+    push_hub.publish([f"category:{topic.category}"], "topic", topic.dict())
     return topic
 
 
+@api_router.get("/forum/topics/{topic_id}/thread")
+async def get_forum_thread(
+    topic_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Get a topic with a page of its replies, oldest first"""
+    topic = await db.forum_topics.find_one({"id": topic_id}, NO_ID)
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    
+    query = {"topic_id": topic_id}
+    if cursor:
+        query.update(keyset_filter("created_at", cursor, topic_id, descending=False))
+    replies = await db.forum_replies.find(query, NO_ID).sort(
+        [("created_at", 1), ("id", 1)]
+    ).limit(limit).to_list(limit)
+    
+    # Only count a view when the thread is opened, not for every page
+    if not cursor:
+        counter_buffer.incr("forum_topics", topic_id, "views")
+    
+    response = FastJSONResponse({"topic": counter_buffer.merge("forum_topics", topic), "replies": replies})
+    token = next_cursor(replies, limit, "created_at", topic_id)
+    if token:
+        response.headers[NEXT_CURSOR_HEADER] = token
+    return response
+
+
+@api_router.get("/forum/topics/{topic_id}/export")
+async def export_forum_thread(topic_id: str):
+    """Stream every reply of a topic as NDJSON, oldest first"""
+    if not await public_db.forum_topics.count_documents({"id": topic_id}, limit=1):
+        raise HTTPException(status_code=404, detail="Topic not found")
+    
+    replies = public_db.forum_replies.find({"topic_id": topic_id}, NO_ID).sort([("created_at", 1), ("id", 1)])
+    return StreamingResponse(
+        ndjson_lines(replies),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="thread-{topic_id}.ndjson"'}
+    )
+
+
 @api_router.post("/forum/topics/{topic_id}/reply")
 async def reply_forum_topic(topic_id: str, content: str, current_user: dict = Depends(get_current_user)):
     """Reply to a forum topic"""
@@ -281,6 +578,7 @@ async def reply_forum_topic(topic_id: str, content: str, current_user: dict = De
     )
     
     await db.forum_replies.insert_one(reply.dict())
+    await index_reply(db, reply.dict(), topic)
     
     # Update topic reply count and last activity
     await db.forum_topics.update_one(
@@ -290,22 +588,62 @@ async def reply_forum_topic(topic_id: str, content: str, current_user: dict = De
             "$set": {"lastActivity": datetime.now(timezone.utc)}
         }
     )
+    await summaries.record_activity(db, current_user["id"], "reply", topic_id, topic["title"])
+    push_hub.publish(
+        [f"topic:{topic_id}", f"category:{topic['category']}"],
+        "reply", {"topic_id": topic_id, "reply": reply.dict()}
+    )
     
     return reply
 
 
+# ===== Live Updates (Server-Sent Events) =====
+MAX_STREAM_CHANNELS = 50
+
+
+@api_router.get("/stream")
+async def stream_updates(
+    request: Request,
+    topic: List[str] = Query([]),
+    category: List[str] = Query([]),
+    event: List[str] = Query([]),
+    last_event_id: Optional[str] = None
+):
+    """Stream forum replies, new topics and event attendance as Server-Sent Events.
+
+    Subscribe with repeated ``topic``, ``category`` and ``event`` params.
+    Browsers resend ``Last-Event-ID`` on reconnect to replay missed messages.
+    """
+    channels = {f"topic:{t}" for t in topic} | {f"category:{c}" for c in category} | {f"event:{e}" for e in event}
+    if not channels:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one topic, category or event")
+    if len(channels) > MAX_STREAM_CHANNELS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STREAM_CHANNELS} subscriptions per stream")
+    if push_hub.is_full():
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "5"})
+    
+    return StreamingResponse(
+        push_hub.stream(channels, request.headers.get("last-event-id") or last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ===== Affiliate Tools Routes =====
 @api_router.get("/affiliate-tools", response_model=List[AffiliateTool])
-async def get_affiliate_tools():
+async def get_affiliate_tools(request: Request):
     """Get all affiliate tools"""
-    tools = await db.affiliate_tools.find().sort("featured", -1).to_list(1000)
-    return MongoJSONEncoder.convert_objectid(tools)
+    async def load():
+        return await public_db.affiliate_tools.find({}, NO_ID).sort("featured", -1).to_list(1000)
+    
+    return await response_cache.respond(request, "affiliate_tools", "all", load, PUBLIC_CACHE_TTL)
 
 
 @api_router.post("/affiliate-tools", response_model=AffiliateTool)
 async def create_affiliate_tool(tool_data: AffiliateTool, current_user: dict = Depends(get_current_user)):
     """Create a new affiliate tool"""
     await db.affiliate_tools.insert_one(tool_data.dict())
+    await catalog_changed("affiliate_tools")
     return tool_data
 
 
@@ -320,6 +658,7 @@ async def update_affiliate_tool(tool_id: str, tool_data: AffiliateTool, current_
         {"id": tool_id},
         {"$set": tool_data.dict()}
     )
+    await catalog_changed("affiliate_tools")
     return tool_data
 
 
@@ -329,21 +668,25 @@ async def delete_affiliate_tool(tool_id: str, current_user: dict = Depends(get_c
     result = await db.affiliate_tools.delete_one({"id": tool_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Tool not found")
+    await catalog_changed("affiliate_tools")
     return {"success": True}
 
 
 # ===== Videos Routes =====
 @api_router.get("/videos", response_model=List[Video])
-async def get_videos():
+async def get_videos(request: Request):
     """Get all video tutorials"""
-    videos = await db.videos.find().sort("created_at", -1).to_list(1000)
-    return MongoJSONEncoder.convert_objectid(videos)
+    async def load():
+        return await public_db.videos.find({}, NO_ID).sort("created_at", -1).to_list(1000)
+    
+    return await response_cache.respond(request, "videos", "all", load, PUBLIC_CACHE_TTL)
 
 
 @api_router.post("/videos", response_model=Video)
 async def create_video(video_data: Video, current_user: dict = Depends(get_current_user)):
     """Create a new video"""
     await db.videos.insert_one(video_data.dict())
+    await catalog_changed("videos")
     return video_data
 
 
@@ -358,6 +701,7 @@ async def update_video(video_id: str, video_data: Video, current_user: dict = De
         {"id": video_id},
         {"$set": video_data.dict()}
     )
+    await catalog_changed("videos")
     return video_data
 
 
@@ -367,9 +711,156 @@ async def delete_video(video_id: str, current_user: dict = Depends(get_current_u
     result = await db.videos.delete_one({"id": video_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Video not found")
+    await catalog_changed("videos")
+    return {"success": True}
+
+
+# ===== Home Route =====
+@api_router.get("/home")
+async def get_home(
+    paths_limit: int = Query(100, ge=1, le=1000),
+    builds_limit: int = Query(4, ge=1, le=100),
+    events_limit: int = Query(100, ge=1, le=1000),
+    topics_limit: int = Query(5, ge=1, le=100),
+    include_user: bool = True,
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """Get everything the landing page and dashboard render in one payload"""
+    # Builds and topics stay on the primary: the dashboard reloads this
+    # right after a user creates one
+    paths, builds, events, topics = await asyncio.gather(
+        public_db.learning_paths.find({}, NO_ID).limit(paths_limit).to_list(paths_limit),
+        db.builds.find({}, NO_ID).sort([("date", -1), ("id", -1)]).limit(builds_limit).to_list(builds_limit),
+        event_schedule.find_events(public_db, EVENT_FIELDS, True, None, None, events_limit).to_list(events_limit),
+        db.forum_topics.find({}, NO_ID).sort([("lastActivity", -1), ("id", -1)]).limit(topics_limit).to_list(topics_limit),
+    )
+    
+    for build in builds:
+        counter_buffer.merge("builds", build)
+        build.setdefault("thumbnails", None)
+    
+    payload = {
+        "learning_paths": paths,
+        "builds": builds,
+        "events": events,
+        "forum_topics": topics,
+        "user_stats": None,
+    }
+    if include_user and current_user:
+        payload["user_stats"] = {
+            "buildsShared": current_user.get("buildsShared", 0),
+            "coursesCompleted": current_user.get("coursesCompleted", 0),
+            "communityRank": current_user.get("communityRank", "Bronze"),
+        }
+    
+    return FastJSONResponse(payload)
+
+
+# ===== Admin Routes =====
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(current_user: dict = Depends(require_admin)):
+    """Get hit/miss counters for the in-process caches"""
+    return {
+        "sessions": session_cache.stats(),
+        "responses": response_cache.stats(),
+        "counters": counter_buffer.stats(),
+        "auth_provider": auth_provider.stats(),
+        "push": push_hub.stats(),
+        "invalidation": change_watcher.stats(),
+    }
+
+
+@api_router.get("/admin/indexes")
+async def get_index_report(current_user: dict = Depends(require_admin)):
+    """Get the startup index reconciliation report"""
+    return getattr(app.state, "index_report", {})
+
+
+@api_router.get("/metrics")
+async def get_metrics(current_user: Optional[dict] = Depends(require_metrics_access)):
+    """Expose request, MongoDB and cache metrics in Prometheus text format"""
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    flagged: bool = False,
+    current_user: dict = Depends(require_admin)
+):
+    """Get recent slow MongoDB commands, newest first, with sampled explain() plans"""
+    entries = slow_query_log.entries()
+    if flagged:
+        entries = [entry for entry in entries if entry["plan"] and entry["plan"]["flags"]]
+    return {"stats": slow_query_log.stats(), "entries": entries[:limit]}
+
+
+@api_router.delete("/admin/slow-queries")
+async def clear_slow_queries(current_user: dict = Depends(require_admin)):
+    """Empty the slow query log"""
+    slow_query_log.clear()
     return {"success": True}
 
 
+@api_router.get("/admin/admission")
+async def get_admission(current_user: dict = Depends(require_admin)):
+    """Get admission pool and rate-limit settings with their counters"""
+    return admission.stats()
+
+
+@api_router.put("/admin/admission")
+async def update_admission(settings: AdmissionSettings, current_user: dict = Depends(require_admin)):
+    """Adjust admission pools and rate limits at runtime"""
+    admission.configure(settings.dict(exclude_none=True))
+    return admission.stats()
+
+
+@api_router.post("/admin/summaries/rebuild")
+async def rebuild_summaries(user_id: Optional[str] = None, current_user: dict = Depends(require_admin)):
+    """Rebuild one user's dashboard summary, or everyone's, from the source collections"""
+    if user_id:
+        await summaries.rebuild_summary(db, user_id)
+        return {"rebuilt": 1}
+    return {"rebuilt": await summaries.rebuild_all_summaries(db)}
+
+
+# ===== Admin Bulk Import/Export Routes =====
+@api_router.post("/admin/affiliate-tools/bulk")
+async def bulk_import_affiliate_tools(request: Request, current_user: dict = Depends(require_admin)):
+    """Upsert affiliate tools by id from an NDJSON stream or JSON array"""
+    report = await bulk_upsert(db.affiliate_tools, AffiliateTool, request_rows(request))
+    await catalog_changed("affiliate_tools")
+    return report
+
+
+@api_router.get("/admin/affiliate-tools/export")
+async def export_affiliate_tools(current_user: dict = Depends(require_admin)):
+    """Stream every affiliate tool as NDJSON"""
+    return StreamingResponse(
+        ndjson_lines(db.affiliate_tools.find({}, NO_ID).sort("id", 1)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="affiliate-tools.ndjson"'}
+    )
+
+
+@api_router.post("/admin/videos/bulk")
+async def bulk_import_videos(request: Request, current_user: dict = Depends(require_admin)):
+    """Upsert videos by id from an NDJSON stream or JSON array"""
+    report = await bulk_upsert(db.videos, Video, request_rows(request))
+    await catalog_changed("videos")
+    return report
+
+
+@api_router.get("/admin/videos/export")
+async def export_videos(current_user: dict = Depends(require_admin)):
+    """Stream every video as NDJSON"""
+    return StreamingResponse(
+        ndjson_lines(db.videos.find({}, NO_ID).sort("id", 1)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="videos.ndjson"'}
+    )
+
+
 # ===== Test Route =====
 @api_router.get("/")
 async def root():
@@ -379,12 +870,17 @@ async def root():
 # Include the router in the main app
 app.include_router(api_router)
 
+# Admission runs inside the metrics middleware so shed requests are counted
+app.middleware("http")(admission)
+app.middleware("http")(record_request_metrics)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Configure logging
@@ -396,4 +892,9 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    push_hub.close()
+    media_store.close()
+    await counter_buffer.stop()
+    await change_watcher.stop()
+    await auth_provider.close()
     client.close()
\ No newline at end of file
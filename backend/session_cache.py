@@ -0,0 +1,124 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class SessionCache:
+    """Bounded LRU cache mapping session tokens to user documents.
+
+    Entries expire after ``ttl_seconds`` or at the session's own ``expires_at``,
+    whichever comes first, so a cached session never outlives the stored one.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._tokens_by_session: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return a copy of the cached user for a token, or None"""
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        user, deadline, _ = entry
+        if deadline <= time.time():
+            self._remove(token)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return dict(user)
+
+    def user_id(self, token: str) -> Optional[str]:
+        """The user id cached for a live token, without counting a hit or miss"""
+        entry = self._entries.get(token)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]["id"]
+
+    def set(self, token: str, user: dict, expires_at: datetime, session_id: Optional[str] = None) -> None:
+        """Cache a user document until the TTL or the session expiry.
+
+        ``session_id`` is the session document's ``_id``, which lets a change
+        event for that document find the token it belongs to.
+        """
+        deadline = min(time.time() + self.ttl_seconds, expires_at.timestamp())
+        if token in self._entries:
+            self._remove(token)
+
+        self._entries[token] = (dict(user), deadline, session_id)
+        self._tokens_by_user.setdefault(user["id"], set()).add(token)
+        if session_id is not None:
+            self._tokens_by_session[session_id] = token
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_token(self, token: str) -> None:
+        """Drop a single session token"""
+        if token in self._entries:
+            self._remove(token)
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop every cached session belonging to a user"""
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._remove(token)
+            self.invalidations += 1
+
+    def invalidate_session(self, session_id: str) -> None:
+        """Drop the token cached for a session document ``_id``"""
+        token = self._tokens_by_session.get(session_id)
+        if token is not None:
+            self.invalidate_token(token)
+
+    def entries(self) -> List[Tuple[str, dict]]:
+        """Every cached (token, user) pair, without touching LRU order or counters"""
+        return [(token, user) for token, (user, _, _) in self._entries.items()]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tokens_by_user.clear()
+        self._tokens_by_session.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, token: str) -> None:
+        user, _, session_id = self._entries.pop(token)
+        if session_id is not None:
+            self._tokens_by_session.pop(session_id, None)
+        tokens = self._tokens_by_user.get(user["id"])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user["id"]]
+
+
+session_cache = SessionCache(
+    max_entries=int(os.environ.get('SESSION_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.environ.get('SESSION_CACHE_TTL', '60')),
+)
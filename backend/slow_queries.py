@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+
+logger = logging.getLogger(__name__)
+
+# Commands explain() accepts, and where each keeps its filter and sort
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Driver-added fields that explain() rejects or that tie the command to a session
+_DRIVER_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "writeConcern", "readConcern"}
+
+
+def _shape(value: Any) -> Any:
+    """Replace literal values with "?" so the log never holds user data"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shape(value[0])] if value else []
+    return "?"
+
+
+def _filter_and_sort(command_name: str, command: dict) -> Tuple[Optional[dict], Optional[dict]]:
+    if command_name == "find":
+        return command.get("filter"), command.get("sort")
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query"), command.get("sort")
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return statements[0].get("q"), None
+    if command_name == "aggregate":
+        match = sort = None
+        for stage in command.get("pipeline", []):
+            if "$match" in stage and match is None:
+                match = stage["$match"]
+            elif "$sort" in stage and sort is None:
+                sort = stage["$sort"]
+        return match, sort
+    return None, None
+
+
+def summarize_explain(explain: dict, ratio_threshold: float) -> dict:
+    """Pull the plan stages and examined/returned counts out of explain() output.
+
+    Works for find and aggregate explains alike by walking the whole document,
+    since aggregate nests the query planner under its first ``$cursor`` stage.
+    """
+    stages: List[str] = []
+    indexes: List[str] = []
+    counts = {"docs_examined": 0, "keys_examined": 0, "returned": 0}
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            if isinstance(node.get("stage"), str):
+                stages.append(node["stage"])
+                if node.get("indexName"):
+                    indexes.append(node["indexName"])
+            if "totalDocsExamined" in node:
+                counts["docs_examined"] += node.get("totalDocsExamined", 0)
+                counts["keys_examined"] += node.get("totalKeysExamined", 0)
+                counts["returned"] += node.get("nReturned", 0)
+            for key, item in node.items():
+                # Rejected plans never ran; their stages would raise false flags
+                if key != "rejectedPlans":
+                    walk(item)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    ratio = counts["docs_examined"] / max(counts["returned"], 1)
+    flags = []
+    if "COLLSCAN" in stages:
+        flags.append("COLLSCAN")
+    if "SORT" in stages:
+        flags.append("IN_MEMORY_SORT")
+    if counts["docs_examined"] and ratio >= ratio_threshold:
+        flags.append("HIGH_EXAMINED_RATIO")
+    return {
+        "stages": list(dict.fromkeys(stages)),
+        "indexes": list(dict.fromkeys(indexes)),
+        **counts,
+        "examined_ratio": round(ratio, 2),
+        "flags": flags,
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Capture MongoDB commands slower than a threshold, with sampled plans.
+
+    Slow commands land in a bounded ring buffer with their collection and the
+    shape of their filter and sort. The first slow occurrence of each shape
+    per ``explain_interval`` seconds is re-run through ``explain()`` on the
+    event loop and annotated with COLLSCAN, in-memory sort and
+    docsExamined/returned flags.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, capacity: int = 200,
+                 explain_interval: float = 300.0, ratio_threshold: float = 100.0):
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self.ratio_threshold = ratio_threshold
+        self.client: Optional[AsyncIOMotorClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Listener callbacks run on Motor's executor threads
+        self._lock = threading.Lock()
+        self._entries: deque = deque(maxlen=capacity)
+        self._started: Dict[tuple, dict] = {}
+        self._last_explained: Dict[str, float] = {}
+        self._plans: Dict[str, dict] = {}
+        self.slow = 0
+        self.explained = 0
+        self.explain_failures = 0
+
+    def start(self, client: AsyncIOMotorClient) -> None:
+        self.client = client
+        self._loop = asyncio.get_running_loop()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in EXPLAINABLE:
+            self._started[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event)
+
+    def _finish(self, event) -> None:
+        command = self._started.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if command is None or duration_ms < self.threshold_ms:
+            return
+
+        query, sort = _filter_and_sort(event.command_name, command)
+        collection = command.get(event.command_name)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "database": event.database_name,
+            "collection": collection,
+            "command": event.command_name,
+            "duration_ms": round(duration_ms, 2),
+            "filter": _shape(query or {}),
+            # Sort directions are part of the query shape, not user data
+            "sort": dict(sort) if sort else None,
+            "plan": None,
+        }
+        shape = repr((collection, event.command_name, entry["filter"], entry["sort"]))
+        now = time.monotonic()
+        with self._lock:
+            self.slow += 1
+            self._entries.append(entry)
+            due = now - self._last_explained.get(shape, float("-inf")) >= self.explain_interval
+            if due:
+                self._last_explained[shape] = now
+            else:
+                # Repeats of a recently explained shape share its plan
+                entry["plan"] = self._plans.get(shape)
+
+        logger.warning(f"Slow {event.command_name} on {collection}: {duration_ms:.1f}ms filter={entry['filter']}")
+        if due and self._loop is not None and self.client is not None:
+            explain = {key: value for key, value in command.items()
+                       if not key.startswith("$") and key not in _DRIVER_FIELDS}
+            asyncio.run_coroutine_threadsafe(self._explain(event.database_name, explain, entry, shape), self._loop)
+
+    async def _explain(self, database: str, command: dict, entry: dict, shape: str) -> None:
+        try:
+            result = await self.client[database].command({"explain": command, "verbosity": "executionStats"})
+        except Exception as e:
+            self.explain_failures += 1
+            logger.warning(f"explain() failed for slow {entry['command']} on {entry['collection']}: {e}")
+            return
+        plan = summarize_explain(result, self.ratio_threshold)
+        with self._lock:
+            entry["plan"] = self._plans[shape] = plan
+            self.explained += 1
+        if plan["flags"]:
+            logger.warning(f"Slow {entry['command']} on {entry['collection']} flagged {plan['flags']}")
+
+    def entries(self, limit: Optional[int] = None) -> List[dict]:
+        """Newest first"""
+        with self._lock:
+            entries = [dict(entry) for entry in reversed(self._entries)]
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._last_explained.clear()
+            self._plans.clear()
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "capacity": self._entries.maxlen,
+            "size": len(self._entries),
+            "slow": self.slow,
+            "explained": self.explained,
+            "explain_failures": self.explain_failures,
+        }
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_MS', '100')),
+    capacity=int(os.environ.get('SLOW_QUERY_LOG_SIZE', '200')),
+    explain_interval=float(os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', '300')),
+    ratio_threshold=float(os.environ.get('SLOW_QUERY_EXAMINED_RATIO', '100')),
+)
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from serialization import NO_ID
+
+
+logger = logging.getLogger(__name__)
+
+RECENT_ACTIVITY_LIMIT = 20
+# Enrolled paths and registered events kept on the summary, newest first
+LIST_LIMIT = 100
+REBUILD_BATCH_SIZE = 50
+
+# Activity type -> counter it increments
+COUNTS = {
+    "enroll": "enrollments",
+    "register": "registrations",
+    "build": "builds",
+    "like": "likes",
+    "reply": "replies",
+}
+# Activity type -> list the entry is pushed onto
+LISTS = {
+    "enroll": "enrolled_paths",
+    "register": "registered_events",
+}
+
+
+async def record_activity(db: AsyncIOMotorDatabase, user_id: str, kind: str, ref_id: str, title: str,
+                          entry: Optional[dict] = None) -> None:
+    """Fold one user action into their summary with a single upsert.
+
+    A summary created by this upsert only holds the actions seen since it
+    was created; it lacks ``complete`` and is rebuilt on first read.
+    """
+    now = datetime.utcnow()
+    push = {
+        "recent_activity": {
+            "$each": [{"type": kind, "ref_id": ref_id, "title": title, "at": now}],
+            "$position": 0,
+            "$slice": RECENT_ACTIVITY_LIMIT,
+        }
+    }
+    if kind in LISTS and entry is not None:
+        push[LISTS[kind]] = {"$each": [entry], "$position": 0, "$slice": LIST_LIMIT}
+
+    await db.user_summaries.update_one(
+        {"user_id": user_id},
+        {"$inc": {f"counts.{COUNTS[kind]}": 1}, "$push": push, "$set": {"updated_at": now}},
+        upsert=True
+    )
+
+
+async def get_summary(db: AsyncIOMotorDatabase, user_id: str) -> dict:
+    """Read a summary by user_id, rebuilding it if it is missing or partial"""
+    summary = await db.user_summaries.find_one({"user_id": user_id}, NO_ID)
+    if summary is None or not summary.pop("complete", False):
+        summary = await rebuild_summary(db, user_id)
+    return summary
+
+
+async def _titles(collection, ids: List[str], *fields: str) -> dict:
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+    return {doc["id"]: doc async for doc in collection.find({"id": {"$in": ids}}, projection)}
+
+
+async def rebuild_summary(db: AsyncIOMotorDatabase, user_id: str) -> dict:
+    """Recompute a user's summary from the source collections.
+
+    Likes are not recorded per user anywhere else, so the like count and
+    like activity already on the summary are carried over.
+    """
+    existing = await db.user_summaries.find_one({"user_id": user_id}, {"counts.likes": 1, "recent_activity": 1}) or {}
+
+    (enrollments, enrollment_count, registrations, registration_count,
+     builds, build_count, replies, reply_count) = await asyncio.gather(
+        db.path_enrollments.find({"user_id": user_id}, NO_ID).sort("created_at", -1).to_list(LIST_LIMIT),
+        db.path_enrollments.count_documents({"user_id": user_id}),
+        db.event_registrations.find({"user_id": user_id}, NO_ID).sort("created_at", -1).to_list(LIST_LIMIT),
+        db.event_registrations.count_documents({"user_id": user_id}),
+        db.builds.find({"builder_id": user_id}, {"_id": 0, "id": 1, "title": 1, "date": 1})
+            .sort("date", -1).to_list(RECENT_ACTIVITY_LIMIT),
+        db.builds.count_documents({"builder_id": user_id}),
+        db.forum_replies.find({"author_id": user_id}, {"_id": 0, "topic_id": 1, "created_at": 1})
+            .sort("created_at", -1).to_list(RECENT_ACTIVITY_LIMIT),
+        db.forum_replies.count_documents({"author_id": user_id}),
+    )
+    paths, events, topics = await asyncio.gather(
+        _titles(db.learning_paths, [e["path_id"] for e in enrollments], "title"),
+        _titles(db.events, [r["event_id"] for r in registrations], "title", "date"),
+        _titles(db.forum_topics, list({r["topic_id"] for r in replies}), "title"),
+    )
+
+    enrolled_paths = [
+        {"path_id": e["path_id"], "title": paths.get(e["path_id"], {}).get("title"), "enrolled_at": e["created_at"]}
+        for e in enrollments
+    ]
+    registered_events = [
+        {"event_id": r["event_id"], "title": events.get(r["event_id"], {}).get("title"),
+         "date": events.get(r["event_id"], {}).get("date"), "registered_at": r["created_at"]}
+        for r in registrations
+    ]
+    activity = [
+        *({"type": "enroll", "ref_id": p["path_id"], "title": p["title"], "at": p["enrolled_at"]}
+          for p in enrolled_paths[:RECENT_ACTIVITY_LIMIT]),
+        *({"type": "register", "ref_id": e["event_id"], "title": e["title"], "at": e["registered_at"]}
+          for e in registered_events[:RECENT_ACTIVITY_LIMIT]),
+        *({"type": "build", "ref_id": b["id"], "title": b["title"], "at": b["date"]} for b in builds),
+        *({"type": "reply", "ref_id": r["topic_id"], "title": topics.get(r["topic_id"], {}).get("title"),
+           "at": r["created_at"]} for r in replies),
+        *(item for item in existing.get("recent_activity", []) if item["type"] == "like"),
+    ]
+    activity.sort(key=lambda item: item["at"], reverse=True)
+
+    summary = {
+        "user_id": user_id,
+        "counts": {
+            "enrollments": enrollment_count,
+            "registrations": registration_count,
+            "builds": build_count,
+            "likes": existing.get("counts", {}).get("likes", 0),
+            "replies": reply_count,
+        },
+        "enrolled_paths": enrolled_paths,
+        "registered_events": registered_events,
+        "recent_activity": activity[:RECENT_ACTIVITY_LIMIT],
+        "updated_at": datetime.utcnow(),
+    }
+    await db.user_summaries.replace_one({"user_id": user_id}, {**summary, "complete": True}, upsert=True)
+    return summary
+
+
+async def rebuild_all_summaries(db: AsyncIOMotorDatabase) -> int:
+    """Rebuild every user's summary, a batch of users at a time"""
+    rebuilt = 0
+    batch = []
+    async for user in db.users.find({}, {"_id": 0, "id": 1}):
+        batch.append(user["id"])
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            await asyncio.gather(*(rebuild_summary(db, user_id) for user_id in batch))
+            rebuilt += len(batch)
+            batch = []
+    if batch:
+        await asyncio.gather(*(rebuild_summary(db, user_id) for user_id in batch))
+        rebuilt += len(batch)
+    logger.info(f"Rebuilt {rebuilt} user summaries")
+    return rebuilt
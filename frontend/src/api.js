@@ -12,6 +12,17 @@ const api = axios.create({
   },
 });
 
+// Home API - landing page and dashboard data in one request
+export const homeAPI = {
+  get: ({ pathsLimit = 100, buildsLimit = 4, eventsLimit = 100, topicsLimit = 5, includeUser = true } = {}) =>
+    api.get(`/home?paths_limit=${pathsLimit}&builds_limit=${buildsLimit}&events_limit=${eventsLimit}&topics_limit=${topicsLimit}&include_user=${includeUser}`),
+};
+
+// Users API
+export const usersAPI = {
+  getSummary: () => api.get('/users/me/summary'),
+};
+
 // Learning Paths API
 export const learningPathsAPI = {
   getAll: () => api.get('/learning-paths'),
@@ -22,16 +33,47 @@ export const learningPathsAPI = {
 // Builds API
 export const buildsAPI = {
   getAll: (limit = 10, offset = 0) => api.get(`/builds?limit=${limit}&offset=${offset}`),
+  // Cursor paging: pass the X-Next-Cursor header of the previous page
+  getPage: (limit = 10, cursor = null) =>
+    api.get(`/builds?limit=${limit}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
   create: (data) => api.post('/builds', data),
   like: (id) => api.post(`/builds/${id}/like`),
+  // Sends the file as the raw body; use the returned id as `image_id` in create()
+  uploadImage: (file) => api.post('/builds/images', file, { headers: { 'Content-Type': file.type } }),
+};
+
+// Prefer a thumbnail of the requested size; uploaded media paths are served by the backend
+export const buildImageUrl = (build, size = 'md') => {
+  const src = (build.thumbnails && build.thumbnails[size]) || build.image;
+  return src && src.startsWith('/') ? `${BACKEND_URL}${src}` : src;
+};
+
+// Every paginated endpoint returns the next page's cursor in the X-Next-Cursor
+// header; null on the last page
+export const nextCursor = (response) => response.headers['x-next-cursor'] || null;
+
+// Leaderboard API
+export const leaderboardAPI = {
+  getTop: (limit = 10) => api.get(`/leaderboard?limit=${limit}`),
+  getMine: () => api.get('/leaderboard/me'),
 };
 
 // Events API
 export const eventsAPI = {
-  getAll: (upcoming = true) => api.get(`/events?upcoming=${upcoming}`),
+  getAll: (upcoming = true, limit = 100) => api.get(`/events?upcoming=${upcoming}&limit=${limit}`),
+  // from/to are Date objects or ISO strings; the window is [from, to)
+  getRange: (from, to, limit = 100) => {
+    const params = new URLSearchParams({ limit });
+    if (from) params.set('from', new Date(from).toISOString());
+    if (to) params.set('to', new Date(to).toISOString());
+    return api.get(`/events?${params}`);
+  },
   register: (id) => api.post(`/events/${id}/register`),
 };
 
+// Subscribable iCalendar feed of upcoming events
+export const eventsCalendarUrl = `${API}/events/calendar.ics`;
+
 // Forum API
 export const forumAPI = {
   getTopics: (category = null, limit = 20, offset = 0) => {
@@ -39,8 +81,37 @@ export const forumAPI = {
     if (category) url += `&category=${category}`;
     return api.get(url);
   },
+  getTopicsPage: (category = null, limit = 20, cursor = null) => {
+    let url = `/forum/topics?limit=${limit}`;
+    if (category) url += `&category=${category}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    return api.get(url);
+  },
+  // Topic with a page of replies, oldest first
+  getThread: (id, limit = 20, cursor = null) =>
+    api.get(`/forum/topics/${id}/thread?limit=${limit}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
+  search: (q, category = null, limit = 20, offset = 0) => {
+    let url = `/forum/search?q=${encodeURIComponent(q)}&limit=${limit}&offset=${offset}`;
+    if (category) url += `&category=${category}`;
+    return api.get(url);
+  },
   createTopic: (data) => api.post('/forum/topics', data),
   replyToTopic: (id, content) => api.post(`/forum/topics/${id}/reply`, { content }),
 };
 
+// Live updates - Server-Sent Events for topics, categories and events.
+// EventSource reconnects on its own and resends Last-Event-ID to resume.
+export const streamAPI = {
+  subscribe: ({ topics = [], categories = [], events = [] }, handlers = {}) => {
+    const params = new URLSearchParams();
+    topics.forEach((id) => params.append('topic', id));
+    categories.forEach((name) => params.append('category', name));
+    events.forEach((id) => params.append('event', id));
+    const source = new EventSource(`${API}/stream?${params}`, { withCredentials: true });
+    Object.entries(handlers).forEach(([type, handler]) =>
+      source.addEventListener(type, (e) => handler(JSON.parse(e.data))));
+    return source;
+  },
+};
+
 export default api;
\ No newline at end of file
@@ -5,7 +5,7 @@ import { Button } from '../components/ui/button';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
 import { Badge } from '../components/ui/badge';
 import { BookOpen, Cpu, Calendar, MessageSquare, TrendingUp, Award } from 'lucide-react';
-import { learningPathsAPI, buildsAPI, eventsAPI, forumAPI } from '../api';
+import { homeAPI, usersAPI, buildImageUrl } from '../api';
 import { useAuth } from '../context/AuthContext';
 
 const Dashboard = () => {
@@ -16,6 +16,8 @@ const Dashboard = () => {
   const [builds, setBuilds] = useState([]);
   const [events, setEvents] = useState([]);
   const [forumTopics, setForumTopics] = useState([]);
+  const [userStats, setUserStats] = useState(null);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -30,17 +32,17 @@ const Dashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [pathsRes, buildsRes, eventsRes, forumRes] = await Promise.all([
-        learningPathsAPI.getAll(),
-        buildsAPI.getAll(10, 0),
-        eventsAPI.getAll(),
-        forumAPI.getTopics(null, 3, 0)
+      const [{ data }, summaryRes] = await Promise.all([
+        homeAPI.get({ buildsLimit: 10, topicsLimit: 3 }),
+        usersAPI.getSummary(),
       ]);
 
-      setLearningPaths(pathsRes.data);
-      setBuilds(buildsRes.data);
-      setEvents(eventsRes.data);
-      setForumTopics(forumRes.data);
+      setLearningPaths(data.learning_paths);
+      setBuilds(data.builds);
+      setEvents(data.events);
+      setForumTopics(data.forum_topics);
+      setUserStats(data.user_stats);
+      setSummary(summaryRes.data);
     } catch (error) {
       console.error('Error fetching data:', error);
     } finally {
@@ -56,6 +58,11 @@ const Dashboard = () => {
     );
   }
 
+  const stats = userStats || user;
+  const enrolledIds = new Set((summary?.enrolled_paths || []).map((p) => p.path_id));
+  const myPaths = learningPaths.filter((path) => enrolledIds.has(path.id));
+  const continuePaths = myPaths.length ? myPaths : learningPaths;
+
   return (
     <div style={{ minHeight: '100vh', padding: '40px 20px', background: 'var(--bg-page)' }}>
       <div className="container">
@@ -70,21 +77,21 @@ const Dashboard = () => {
           <Card style={{ background: 'var(--bg-card)', border: '1px solid var(--border-medium)', padding: '24px' }}>
             <div style={{ display: 'flex', alignItems: 'center', gap: '12px', marginBottom: '8px' }}>
               <BookOpen size={24} color="var(--brand-primary)" />
-              <h3 className="heading-5" style={{ color: 'var(--text-primary)' }}>{user.coursesCompleted}</h3>
+              <h3 className="heading-5" style={{ color: 'var(--text-primary)' }}>{stats.coursesCompleted}</h3>
             </div>
             <p className="body-small">Courses Completed</p>
           </Card>
           <Card style={{ background: 'var(--bg-card)', border: '1px solid var(--border-medium)', padding: '24px' }}>
             <div style={{ display: 'flex', alignItems: 'center', gap: '12px', marginBottom: '8px' }}>
               <Cpu size={24} color="var(--brand-primary)" />
-              <h3 className="heading-5" style={{ color: 'var(--text-primary)' }}>{user.buildsShared}</h3>
+              <h3 className="heading-5" style={{ color: 'var(--text-primary)' }}>{stats.buildsShared}</h3>
             </div>
             <p className="body-small">Builds Shared</p>
           </Card>
           <Card style={{ background: 'var(--bg-card)', border: '1px solid var(--border-medium)', padding: '24px' }}>
             <div style={{ display: 'flex', alignItems: 'center', gap: '12px', marginBottom: '8px' }}>
               <Award size={24} color="var(--brand-primary)" />
-              <h3 className="heading-5" style={{ color: 'var(--text-primary)' }}>{user.communityRank}</h3>
+              <h3 className="heading-5" style={{ color: 'var(--text-primary)' }}>{stats.communityRank}</h3>
             </div>
             <p className="body-small">Community Rank</p>
           </Card>
@@ -105,7 +112,7 @@ const Dashboard = () => {
               <div>
                 <h3 className="heading-4" style={{ color: 'var(--text-primary)', marginBottom: '20px' }}>Continue Learning</h3>
                 <div style={{ display: 'grid', gridTemplateColumns: 'repeat(auto-fit, minmax(300px, 1fr))', gap: '20px' }}>
-                  {learningPaths.slice(0, 2).map((path) => (
+                  {continuePaths.slice(0, 2).map((path) => (
                     <Card key={path.id} className="hover-lift" style={{ background: 'var(--bg-card)', border: '1px solid var(--border-medium)', padding: '24px', cursor: 'pointer' }}>
                       <Badge style={{ background: 'var(--secondary-olive)', color: 'var(--text-primary)', marginBottom: '12px' }}>{path.difficulty}</Badge>
                       <h4 className="heading-6" style={{ color: 'var(--text-primary)', marginBottom: '8px' }}>{path.title}</h4>
@@ -182,7 +189,7 @@ const Dashboard = () => {
                 <Card key={build.id} className="overflow-hidden hover-lift" style={{ background: 'var(--bg-card)', border: '1px solid var(--border-medium)', cursor: 'pointer' }}>
                   <div style={{ position: 'relative', height: '200px', overflow: 'hidden' }}>
                     <img 
-                      src={build.image} 
+                      src={buildImageUrl(build, 'sm')} 
                       alt={build.title}
                       style={{ width: '100%', height: '100%', objectFit: 'cover' }}
                     />
@@ -4,7 +4,7 @@ import { Button } from '../components/ui/button';
 import { Card } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
 import { Cpu, Users, BookOpen, Calendar, Heart, Eye, MessageSquare, TrendingUp } from 'lucide-react';
-import { learningPathsAPI, buildsAPI, eventsAPI, forumAPI } from '../api';
+import { homeAPI, buildImageUrl } from '../api';
 import { useAuth } from '../context/AuthContext';
 
 const Home = () => {
@@ -22,17 +22,12 @@ const Home = () => {
 
   const fetchData = async () => {
     try {
-      const [pathsRes, buildsRes, eventsRes, forumRes] = await Promise.all([
-        learningPathsAPI.getAll(),
-        buildsAPI.getAll(4, 0),
-        eventsAPI.getAll(),
-        forumAPI.getTopics(null, 5, 0)
-      ]);
+      const { data } = await homeAPI.get({ buildsLimit: 4, topicsLimit: 5, includeUser: false });
 
-      setLearningPaths(pathsRes.data);
-      setBuilds(buildsRes.data);
-      setEvents(eventsRes.data);
-      setForumTopics(forumRes.data);
+      setLearningPaths(data.learning_paths);
+      setBuilds(data.builds);
+      setEvents(data.events);
+      setForumTopics(data.forum_topics);
     } catch (error) {
       console.error('Error fetching data:', error);
     } finally {
@@ -144,7 +139,7 @@ const Home = () => {
               <Card key={build.id} className="card-gaming hover-lift" style={{ cursor: 'pointer' }}>
                 <div style={{ position: 'relative', height: '250px', overflow: 'hidden' }}>
                   <img 
-                    src={build.image} 
+                    src={buildImageUrl(build, 'md')} 
                     alt={build.title}
                     className="image-zoom"
                     style={{ width: '100%', height: '100%', objectFit: 'cover' }}
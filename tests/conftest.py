@@ -0,0 +1,32 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend is a flat package run from its own directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ.setdefault("CACHE_INVALIDATION_MODE", "off")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    """A fresh in-memory database with the declared indexes, used by the app"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+    from indexes import ensure_indexes
+    from models import INDEXES
+
+    database = AsyncMongoMockClient()["test_database"]
+    await ensure_indexes(database, INDEXES)
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "public_db", database)
+    return database
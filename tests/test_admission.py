@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+
+import auth
+from admission import AdmissionController, AdmissionPool, RateLimiter
+from session_cache import session_cache
+
+pytestmark = pytest.mark.anyio
+
+
+def _request(headers=(), peer="10.0.0.1") -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": "/api/builds", "client": (peer, 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+    })
+
+
+def _controller(**options) -> AdmissionController:
+    return AdmissionController({}, RateLimiter(1, 1), RateLimiter(1, 1), **options)
+
+
+def test_untrusted_forwarded_for_skips_the_ip_bucket(caplog):
+    controller = _controller()
+    request = _request([("X-Forwarded-For", "1.2.3.4")])
+    # Neither the client-supplied header nor the proxy's peer address is keyed on
+    assert controller.client_ip(request) is None
+    assert controller.client_ip(request) is None
+    assert caplog.text.count("X-Forwarded-For is not trusted") == 1
+    assert controller.client_ip(_request()) == "10.0.0.1"
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+async def test_clients_behind_one_proxy_do_not_share_a_limit(trusted):
+    pool = AdmissionPool("read", max_concurrent=10, max_queue=10, queue_timeout=1)
+    controller = AdmissionController({"read": pool}, RateLimiter(rate=0, burst=2), RateLimiter(1, 1),
+                                     trust_forwarded_for=trusted)
+
+    async def call_next(request):
+        return Response("ok")
+
+    async def status(client: str) -> int:
+        request = _request([("X-Forwarded-For", client)], peer="10.0.0.1")
+        return (await controller(request, call_next)).status_code
+
+    # Four requests from one peer address, two from each client: each stays under its burst
+    assert [await status(client) for client in ("1.1.1.1", "2.2.2.2", "1.1.1.1", "2.2.2.2")] == [200] * 4
+    if trusted:
+        assert await status("1.1.1.1") == 429
+
+
+@pytest.mark.parametrize("forwarded, proxies, expected", [
+    # The client-supplied leftmost entries are never used
+    ("6.6.6.6, 203.0.113.7", 1, "203.0.113.7"),
+    ("6.6.6.6, 203.0.113.7, 10.1.1.1", 2, "203.0.113.7"),
+    # Fewer hops than proxies: the request did not come through them all
+    ("203.0.113.7", 2, "10.0.0.1"),
+])
+def test_forwarded_for_is_read_from_the_trusted_hop(forwarded, proxies, expected):
+    request = _request([("X-Forwarded-For", forwarded)])
+    assert _controller(trust_forwarded_for=True, trusted_proxies=proxies).client_ip(request) == expected
+
+
+def test_cached_sessions_of_one_user_share_a_limit_key():
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    session_cache.set("token-a", {"id": "u1"}, expires)
+    session_cache.set("token-b", {"id": "u1"}, expires)
+    try:
+        keys = {
+            AdmissionController.session_key(_request([("Authorization", f"Bearer {token}")]))
+            for token in ("token-a", "token-b")
+        }
+        assert keys == {"user:u1"}
+        uncached = AdmissionController.session_key(_request([("Authorization", "Bearer token-c")]))
+        assert uncached.startswith("session:") and "token-c" not in uncached
+    finally:
+        session_cache.invalidate_user("u1")
+
+
+async def test_admin_routes_require_a_listed_email(db, monkeypatch):
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    for user_id, email in (("u1", "admin@example.com"), ("u2", "user@example.com")):
+        await db.users.insert_one({"id": user_id, "email": email, "name": user_id})
+        await db.sessions.insert_one({"session_token": f"tok-{user_id}", "user_id": user_id, "expires_at": expires})
+    monkeypatch.setattr(auth, "ADMIN_EMAILS", {"admin@example.com"})
+
+    assert (await auth.require_admin("tok-u1", None))["id"] == "u1"
+    with pytest.raises(HTTPException) as rejected:
+        await auth.require_admin("tok-u2", None)
+    assert rejected.value.status_code == 403
+    session_cache.invalidate_user("u1")
+    session_cache.invalidate_user("u2")
+
+
+async def test_metrics_need_the_scrape_token_or_an_admin(db, monkeypatch):
+    monkeypatch.setattr(auth, "METRICS_TOKEN", "scrape-secret")
+    assert await auth.require_metrics_access(None, "Bearer scrape-secret") is None
+    for authorization in (None, "Bearer wrong", "scrape-secret"):
+        with pytest.raises(HTTPException) as rejected:
+            await auth.require_metrics_access(None, authorization)
+        assert rejected.value.status_code == 401
+
+    # Without a configured token, only admins get through
+    monkeypatch.setattr(auth, "METRICS_TOKEN", "")
+    with pytest.raises(HTTPException):
+        await auth.require_metrics_access(None, "Bearer ")
@@ -0,0 +1,86 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+USERS = 200
+CAPACITY = 25
+
+
+def _users(count):
+    return [{"id": f"user-{i}", "name": f"User {i}"} for i in range(count)]
+
+
+def _details(results):
+    return Counter(r.detail for r in results if isinstance(r, HTTPException))
+
+
+async def test_concurrent_registrations_never_oversell(db):
+    await db.events.insert_one({
+        "id": "e1", "title": "Workshop", "date": "2030-01-01", "time": "12:00 UTC", "location": "Online",
+        "image": "", "attendees": 0, "maxAttendees": CAPACITY, "description": "",
+    })
+    # Every user tries twice at once; 400 attempts for 25 seats
+    attempts = [user for user in _users(USERS) for _ in range(2)]
+    results = await asyncio.gather(
+        *(server.register_event("e1", current_user=user) for user in attempts), return_exceptions=True
+    )
+
+    unexpected = [r for r in results if isinstance(r, Exception) and not isinstance(r, HTTPException)]
+    assert not unexpected
+    assert all(r.status_code == 400 for r in results if isinstance(r, HTTPException))
+
+    event = await db.events.find_one({"id": "e1"})
+    registrations = await db.event_registrations.find({"event_id": "e1"}).to_list(None)
+    per_user = Counter(r["user_id"] for r in registrations)
+
+    assert event["attendees"] == CAPACITY <= event["maxAttendees"]
+    assert len(registrations) == CAPACITY
+    assert set(per_user.values()) == {1}
+    successes = [r for r in results if not isinstance(r, Exception)]
+    assert len(successes) == CAPACITY
+    assert all(r["attendees"] <= CAPACITY for r in successes)
+    assert sum(_details(results).values()) == len(attempts) - CAPACITY
+    assert set(_details(results)) <= {"Event is full", "Already registered"}
+
+
+async def test_repeat_registration_is_rejected(db):
+    await db.events.insert_one({
+        "id": "e2", "title": "Q&A", "date": "2030-01-01", "time": "12:00 UTC", "location": "Online",
+        "image": "", "attendees": 0, "maxAttendees": 10, "description": "",
+    })
+    user = _users(1)[0]
+    await server.register_event("e2", current_user=user)
+    with pytest.raises(HTTPException) as error:
+        await server.register_event("e2", current_user=user)
+    assert (error.value.status_code, error.value.detail) == (400, "Already registered")
+    assert (await db.events.find_one({"id": "e2"}))["attendees"] == 1
+
+
+async def test_concurrent_enrollments_count_each_user_once(db):
+    await db.learning_paths.insert_one({"id": "p1", "title": "First Build", "enrolled": 0})
+    attempts = [user for user in _users(USERS) for _ in range(3)]
+    results = await asyncio.gather(
+        *(server.enroll_learning_path("p1", current_user=user) for user in attempts), return_exceptions=True
+    )
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    assert all(isinstance(r, HTTPException) and r.status_code == 400 and r.detail == "Already enrolled"
+               for r in failures)
+    assert len(failures) == len(attempts) - USERS
+
+    enrollments = await db.path_enrollments.find({"path_id": "p1"}).to_list(None)
+    assert Counter(e["user_id"] for e in enrollments) == Counter({user["id"]: 1 for user in _users(USERS)})
+    assert (await db.learning_paths.find_one({"id": "p1"}))["enrolled"] == USERS
+
+
+async def test_enrolling_in_a_missing_path_leaves_no_row(db):
+    with pytest.raises(HTTPException) as error:
+        await server.enroll_learning_path("missing", current_user=_users(1)[0])
+    assert error.value.status_code == 404
+    assert await db.path_enrollments.count_documents({}) == 0
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import auth
+from auth_client import AuthProviderClient, AuthProviderError, CircuitBreaker, CircuitOpenError, InvalidSessionError
+
+pytestmark = pytest.mark.anyio
+
+USER = {"id": "u1", "email": "u1@example.com", "name": "U1", "session_token": "tok"}
+
+
+class StubProvider:
+    """Scripted auth provider: each call pops the next response (or exception)"""
+
+    def __init__(self, *script, delay: float = 0.0):
+        self.script = list(script)
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request.headers["X-Session-ID"])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        outcome = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, httpx.Response):
+            return outcome
+        return httpx.Response(outcome, json=USER if outcome == 200 else {"detail": "nope"})
+
+
+def _client(provider, **breaker):
+    return AuthProviderClient(
+        "https://auth.example/session-data", retries=2, backoff=0,
+        breaker=CircuitBreaker(**breaker), transport=httpx.MockTransport(provider),
+    )
+
+
+async def test_concurrent_exchanges_of_one_session_share_a_request():
+    provider = StubProvider(200, delay=0.05)
+    client = _client(provider)
+    results = await asyncio.gather(*(client.exchange("s1") for _ in range(10)), client.exchange("s2"))
+    assert all(result == USER for result in results)
+    assert sorted(provider.calls) == ["s1", "s2"]
+    assert client.stats()["in_flight"] == 0
+
+
+async def test_rejected_session_does_not_trip_the_breaker():
+    provider = StubProvider(401)
+    client = _client(provider, failure_threshold=1)
+    for _ in range(3):
+        with pytest.raises(InvalidSessionError):
+            await client.exchange("bad")
+    # A 4xx is answered once, never retried, and leaves the circuit closed
+    assert len(provider.calls) == 3
+    assert client.breaker.state == "closed" and client.breaker.failures == 0
+
+
+@pytest.mark.parametrize("failure", [
+    503,
+    httpx.ConnectError("refused"),
+    httpx.Response(200, text="<html>Bad gateway</html>"),
+    httpx.Response(200, json=["not", "a", "user"]),
+])
+async def test_server_errors_retry_then_open_the_circuit(failure):
+    provider = StubProvider(failure)
+    client = _client(provider, failure_threshold=2, reset_timeout=60)
+
+    with pytest.raises(AuthProviderError):
+        await client.exchange("s1")
+    # Three attempts, but one exchange counts as one failure
+    assert len(provider.calls) == 3
+    assert client.breaker.failures == 1 and client.breaker.state == "closed"
+
+    with pytest.raises(AuthProviderError):
+        await client.exchange("s2")
+    assert client.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        await client.exchange("s3")
+    assert len(provider.calls) == 6
+
+
+async def test_half_open_lets_a_single_probe_through():
+    provider = StubProvider(503, 200, delay=0.05)
+    client = AuthProviderClient(
+        "https://auth.example/session-data", retries=0, backoff=0,
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.1), transport=httpx.MockTransport(provider),
+    )
+    with pytest.raises(AuthProviderError):
+        await client.exchange("first")
+    assert client.breaker.state == "open"
+
+    await asyncio.sleep(0.15)
+    assert client.breaker.state == "half-open"
+    results = await asyncio.gather(*(client.exchange(f"s{i}") for i in range(5)), return_exceptions=True)
+
+    probes = [result for result in results if result == USER]
+    rejected = [result for result in results if isinstance(result, CircuitOpenError)]
+    assert len(probes) == 1 and len(rejected) == 4
+    assert len(provider.calls) == 2
+    assert client.breaker.state == "closed"
+
+    assert await client.exchange("after") == USER
+
+
+async def test_failed_probe_reopens_the_circuit():
+    provider = StubProvider(503)
+    client = AuthProviderClient(
+        "https://auth.example/session-data", retries=0, backoff=0,
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.1), transport=httpx.MockTransport(provider),
+    )
+    with pytest.raises(AuthProviderError):
+        await client.exchange("first")
+    await asyncio.sleep(0.15)
+    with pytest.raises(AuthProviderError):
+        await client.exchange("probe")
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await client.exchange("next")
+
+
+async def test_unreadable_provider_answer_is_a_503(monkeypatch):
+    provider = StubProvider(httpx.Response(200, text="<html>"))
+    monkeypatch.setattr(auth, "auth_provider", _client(provider))
+    with pytest.raises(HTTPException) as rejected:
+        await auth.exchange_session_id("s1")
+    assert rejected.value.status_code == 503
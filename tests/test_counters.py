@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from counters import CounterBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+class Collection:
+    def __init__(self, gate=None, error=None):
+        self.gate = gate
+        self.error = error
+        self.writes = []
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        self.writes.extend(operations)
+
+
+class Database(dict):
+    def __getitem__(self, name):
+        return self.setdefault(name, Collection())
+
+
+async def test_deltas_stay_visible_while_their_write_is_in_flight():
+    gate = asyncio.Event()
+    db = Database(builds=Collection(gate=gate))
+    buffer = CounterBuffer()
+    buffer.db = db
+    buffer.incr("builds", "b1", "likes", 3)
+
+    flush = asyncio.create_task(buffer.flush())
+    await asyncio.sleep(0)
+    buffer.incr("builds", "b1", "likes")
+    assert buffer.merge("builds", {"id": "b1", "likes": 10})["likes"] == 14
+
+    gate.set()
+    assert await flush == 1
+    # The written 3 are now in the document; only the later 1 is pending
+    assert buffer.merge("builds", {"id": "b1", "likes": 13})["likes"] == 14
+
+
+async def test_failed_write_requeues_its_deltas():
+    db = Database(builds=Collection(error=RuntimeError("primary stepped down")))
+    buffer = CounterBuffer()
+    buffer.db = db
+    buffer.incr("builds", "b1", "likes", 2)
+
+    assert await buffer.flush() == 0
+    assert buffer.pending("builds", "b1") == {"likes": 2}
+
+    db["builds"].error = None
+    assert await buffer.flush() == 1
+    assert buffer.pending("builds", "b1") == {}
+
+
+async def test_cancelled_flush_requeues_unwritten_deltas():
+    gate = asyncio.Event()
+    db = Database(builds=Collection(gate=gate))
+    buffer = CounterBuffer()
+    buffer.db = db
+    buffer.incr("builds", "b1", "likes")
+
+    flush = asyncio.create_task(buffer.flush())
+    await asyncio.sleep(0)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+    assert buffer.pending("builds", "b1") == {"likes": 1}
+
+
+async def test_eager_flush_is_tracked_and_failures_are_logged(caplog):
+    db = Database(builds=Collection(error=RuntimeError("boom")))
+    buffer = CounterBuffer(max_pending=1)
+    buffer.db = db
+    buffer.flush = _failing_flush
+    buffer.incr("builds", "b1", "likes")
+    task = buffer._eager_flush
+    assert task is not None
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert buffer._eager_flush is None
+    assert "Counter flush failed" in caplog.text
+
+
+async def _failing_flush():
+    raise RuntimeError("boom")
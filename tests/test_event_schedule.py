@@ -0,0 +1,98 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from event_schedule import _fold, event_start, utc_window, with_start
+
+
+@pytest.mark.parametrize("time_of_day, expected", [
+    ("12 AM", datetime(2026, 3, 2, 0, 0)),
+    ("12:30 am", datetime(2026, 3, 2, 0, 30)),
+    ("12 PM", datetime(2026, 3, 2, 12, 0)),
+    ("1pm", datetime(2026, 3, 2, 13, 0)),
+    ("18:00", datetime(2026, 3, 2, 18, 0)),
+    ("14:00 EST", datetime(2026, 3, 2, 19, 0)),
+    ("2pm PST", datetime(2026, 3, 2, 22, 0)),
+])
+def test_event_start_reads_clock_times(time_of_day, expected):
+    assert event_start("2026-03-02", time_of_day) == expected
+
+
+@pytest.mark.parametrize("day, time_of_day", [
+    ("2026-03-02", "13 PM"),
+    ("2026-03-02", "0 AM"),
+    ("2026-03-02", "24:00"),
+    ("2026-03-02", "10:60"),
+    ("2026-03-02", "7pm Mars/Olympus"),
+    ("2026-03-02", "TBA"),
+    ("March 2nd", "18:00"),
+    (None, "18:00"),
+])
+def test_event_start_rejects_unreadable_times(day, time_of_day):
+    assert event_start(day, time_of_day) is None
+
+
+@pytest.mark.parametrize("zone", ["America/New_York", "ET", "et"])
+def test_iana_zones_and_aliases_follow_daylight_saving(zone):
+    assert event_start("2026-01-15", f"7:00 PM {zone}") == datetime(2026, 1, 16, 0, 0)
+    assert event_start("2026-07-15", f"7:00 PM {zone}") == datetime(2026, 7, 15, 23, 0)
+
+
+def test_fixed_abbreviations_do_not_follow_daylight_saving():
+    # EST is always UTC-5, even in July when New York is on EDT
+    assert event_start("2026-07-15", "7:00 PM EST") == datetime(2026, 7, 16, 0, 0)
+    assert event_start("2026-07-15", "7:00 PM EDT") == event_start("2026-07-15", "7:00 PM ET")
+
+
+@pytest.mark.parametrize("zone, offset", [("CT", 5), ("MT", 6), ("PT", 7)])
+def test_us_zone_aliases(zone, offset):
+    assert event_start("2026-07-15", f"9:00 AM {zone}") == datetime(2026, 7, 15, 9 + offset, 0)
+
+
+@pytest.mark.parametrize("text", ["é" * 100, "日本語のイベント" * 20, "a" + "🎉" * 60, "x" * 75])
+def test_fold_never_splits_a_utf8_character(text):
+    line = "SUMMARY:" + text
+    folded = _fold(line)
+    assert folded.endswith(b"\r\n")
+
+    parts = folded[:-2].split(b"\r\n ")
+    assert len(parts[0]) <= 75 and all(len(part) <= 74 for part in parts[1:])
+    # Every part decodes on its own, and unfolding restores the line
+    assert "".join(part.decode("utf-8") for part in parts) == line
+
+
+def test_short_lines_are_not_folded():
+    assert _fold("BEGIN:VCALENDAR") == b"BEGIN:VCALENDAR\r\n"
+
+
+def test_utc_window_normalizes_to_naive_utc():
+    start = datetime(2026, 7, 15, 19, 0, tzinfo=timezone(timedelta(hours=-4)))
+    end = datetime(2026, 7, 16, 12, 0)
+    assert utc_window(start, end) == (datetime(2026, 7, 15, 23, 0), end)
+    assert utc_window(None, None) == (None, None)
+    assert utc_window(start, None) == (datetime(2026, 7, 15, 23, 0), None)
+
+
+@pytest.mark.parametrize("end", [datetime(2026, 7, 15, 23, 0), datetime(2026, 7, 15, 22, 0)])
+def test_utc_window_rejects_empty_windows(end):
+    start = datetime(2026, 7, 15, 19, 0, tzinfo=timezone(timedelta(hours=-4)))
+    with pytest.raises(HTTPException) as rejected:
+        utc_window(start, end)
+    assert rejected.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_home_lists_upcoming_events_soonest_first(db):
+    soon, later = datetime.utcnow() + timedelta(days=1), datetime.utcnow() + timedelta(days=30)
+    await db.events.insert_many([with_start({"id": event_id, "date": day, "time": time_of_day}) for event_id, day, time_of_day in [
+        ("later", later.date().isoformat(), "18:00"),
+        ("past", "2020-01-01", "18:00"),
+        ("unreadable", soon.date().isoformat(), "TBA"),
+        ("soon", soon.date().isoformat(), "7:00 PM ET"),
+    ]])
+    response = await server.get_home(paths_limit=10, builds_limit=4, events_limit=10, topics_limit=5,
+                                     include_user=False, current_user=None)
+    assert [event["id"] for event in json.loads(response.body)["events"]] == ["soon", "later"]
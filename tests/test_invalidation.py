@@ -0,0 +1,226 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure
+
+from invalidation import (
+    NOT_A_REPLICA_SET, RESUME_POINT_LOST, RESYNC, TOKENS_COLLECTION, VERSIONS_COLLECTION, ChangeWatcher
+)
+from response_cache import ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+class Worker:
+    """One app worker's response cache and watcher, sharing the database with the others"""
+
+    def __init__(self, db):
+        self.db = db
+        self.cache = ResponseCache()
+        self.watcher = ChangeWatcher(mode="poll")
+        self.watcher.register("videos", lambda change: self.cache.bump(change.collection), poll=True)
+        self.watcher.db = db
+        self.watcher.state = "polling"
+
+    def cache_videos(self):
+        self.cache.set("videos", "list", self.cache.version("videos"), b"[]")
+
+    async def write_video(self, video_id: str):
+        await self.db.videos.insert_one({"id": video_id})
+        self.cache.bump("videos")
+        await self.watcher.publish("videos")
+
+
+async def test_a_write_in_one_worker_invalidates_the_others_when_polling():
+    db = AsyncMongoMockClient()["test_database"]
+    writer, reader = Worker(db), Worker(db)
+    for worker in (writer, reader):
+        await worker.watcher.poll()
+        worker.cache_videos()
+
+    await writer.write_video("v1")
+    assert writer.cache.get("videos", "list") is None
+    assert reader.cache.get("videos", "list") is not None
+
+    await reader.watcher.poll()
+    assert reader.cache.get("videos", "list") is None
+
+    # The writer's own publish does not cost it another resync
+    writer.cache_videos()
+    await writer.watcher.poll()
+    assert writer.cache.get("videos", "list") is not None
+    assert writer.watcher.resyncs == 0 and reader.watcher.resyncs == 1
+
+
+async def test_polling_reads_versions_not_documents():
+    db = AsyncMongoMockClient()["test_database"]
+    worker = Worker(db)
+    await db.videos.insert_many([{"id": f"v{i}"} for i in range(50)])
+    await worker.watcher.poll()
+    worker.cache_videos()
+
+    # Writes nobody publishes are not seen, because the collection is never scanned
+    await db.videos.update_many({}, {"$set": {"title": "changed"}})
+    await worker.watcher.poll()
+    assert worker.cache.get("videos", "list") is not None
+
+
+async def test_change_stream_events_invalidate_another_workers_cache():
+    db = AsyncMongoMockClient()["test_database"]
+    reader = Worker(db)
+    reader.cache_videos()
+
+    # What the reader's change stream delivers after a write in another worker
+    reader.watcher.apply({"operationType": "update", "ns": {"db": "test_database", "coll": "videos"},
+                          "documentKey": {"_id": "abc"}})
+    assert reader.cache.get("videos", "list") is None
+
+    received = []
+    reader.watcher.register("videos", received.append)
+    reader.watcher.apply({"operationType": "drop", "ns": {"db": "test_database", "coll": "videos"}})
+    assert [change.operation for change in received] == [RESYNC]
+
+
+class StubStream:
+    """A change stream replaying scripted events, then closing"""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.resume_token = None
+
+    @property
+    def alive(self):
+        return bool(self.events)
+
+    async def try_next(self):
+        event = self.events.pop(0)
+        self.resume_token = event["_id"]
+        return event
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class StubDatabase:
+    """A replica set stand-in: each watch() opens the next scripted stream or raises its error.
+
+    Other collections are served from an in-memory database. Once the
+    script runs out the watcher is cancelled, as on shutdown.
+    """
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.watches = []
+        self.backing = AsyncMongoMockClient()["test_database"]
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, self.backing[name])
+
+    def watch(self, pipeline, full_document=None, start_after=None, max_await_time_ms=None):
+        self.watches.append(start_after)
+        if not self.script:
+            raise asyncio.CancelledError
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return StubStream(step)
+
+
+def _event(token: str, operation: str = "update", collection: str = "videos") -> dict:
+    return {"_id": {"_data": token}, "operationType": operation,
+            "ns": {"db": "test_database", "coll": collection}, "documentKey": {"_id": token}}
+
+
+def _watcher(db, **options) -> tuple:
+    watcher = ChangeWatcher(checkpoint_interval=0, retry_interval=0, **options)
+    changes = []
+    watcher.register("videos", changes.append, poll=True)
+    watcher.db = db
+    return watcher, changes
+
+
+async def _saved_token(db):
+    saved = await db[TOKENS_COLLECTION].find_one({"_id": "cache_invalidation"})
+    return saved and saved["resume_token"]
+
+
+async def test_watch_resumes_from_the_checkpoint_and_saves_each_token():
+    db = StubDatabase([_event("t6"), _event("t7", "delete")])
+    await db[TOKENS_COLLECTION].insert_one({"_id": "cache_invalidation", "resume_token": {"_data": "t5"}})
+    watcher, changes = _watcher(db)
+    with pytest.raises(asyncio.CancelledError):
+        await watcher._run()
+
+    assert db.watches[0] == {"_data": "t5"}
+    assert [(change.operation, change.doc_id) for change in changes] == [("update", "t6"), ("delete", "t7")]
+    assert await _saved_token(db) == {"_data": "t7"}
+    # The stream reopened after closing picks up where it stopped, without a resync
+    assert db.watches[1] == {"_data": "t7"} and watcher.resyncs == 0
+
+
+async def test_checkpoint_is_written_after_every_event():
+    db = StubDatabase([_event("t1"), _event("t2")])
+    watcher, _ = _watcher(db)
+    tokens = []
+    update_one = db[TOKENS_COLLECTION].update_one
+
+    async def spy(filter, update, **options):
+        tokens.append(update["$set"]["resume_token"]["_data"])
+        return await update_one(filter, update, **options)
+    db[TOKENS_COLLECTION].update_one = spy
+
+    with pytest.raises(asyncio.CancelledError):
+        await watcher._run()
+    assert tokens == ["t1", "t2"]
+
+
+@pytest.mark.parametrize("code", sorted(RESUME_POINT_LOST))
+async def test_lost_resume_point_resyncs_every_handler(code):
+    db = StubDatabase(OperationFailure("resume point lost", code=code), [_event("t9")])
+    await db[TOKENS_COLLECTION].insert_one({"_id": "cache_invalidation", "resume_token": {"_data": "gone"}})
+    worker = Worker(db.backing)
+    worker.watcher = watcher = ChangeWatcher(checkpoint_interval=0, retry_interval=0)
+    watcher.register("videos", lambda change: worker.cache.bump(change.collection))
+    changes = []
+    watcher.register("videos", changes.append)
+    watcher.db = db
+    worker.cache_videos()
+
+    with pytest.raises(asyncio.CancelledError):
+        await watcher._run()
+
+    # Reopened from now rather than from the unusable token
+    assert db.watches[:2] == [{"_data": "gone"}, None]
+    assert [change.operation for change in changes] == [RESYNC, "update"]
+    assert worker.cache.get("videos", "list") is None
+    assert await _saved_token(db) == {"_data": "t9"}
+
+
+async def test_standalone_server_falls_back_to_polling():
+    db = StubDatabase(OperationFailure("not a replica set", code=NOT_A_REPLICA_SET))
+    watcher, changes = _watcher(db, poll_interval=0.01)
+    watcher.start(db)
+    while watcher.polls < 2:
+        await asyncio.sleep(0.01)
+    assert watcher.state == "polling" and len(db.watches) == 1
+
+    await db[VERSIONS_COLLECTION].insert_one({"_id": "videos", "version": 1})
+    polls = watcher.polls
+    while watcher.polls < polls + 2:
+        await asyncio.sleep(0.01)
+    await watcher.stop()
+    assert [change.operation for change in changes] == [RESYNC]
+
+
+async def test_not_a_replica_set_is_retried_when_change_streams_are_required():
+    db = StubDatabase(OperationFailure("not a replica set", code=NOT_A_REPLICA_SET), [_event("t1")])
+    watcher, changes = _watcher(db, mode="change_stream")
+    with pytest.raises(asyncio.CancelledError):
+        await watcher._run()
+    assert watcher.errors == 1 and watcher.state == "change_stream"
+    assert [change.doc_id for change in changes] == ["t1"]
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+import leaderboard
+
+pytestmark = pytest.mark.anyio
+
+
+async def _counts(db) -> dict:
+    return {row["score"]: row["count"] async for row in db.leaderboard_scores.find({"count": {"$ne": 0}})}
+
+
+async def test_rank_is_counted_from_the_scores_above(db):
+    activity = {"u1": {"buildsShared": 2}, "u2": {"buildsShared": 1}, "u3": {"enrollments": 5}, "u4": {"enrollments": 1}}
+    for user_id, deltas in activity.items():
+        await leaderboard.record_activity(db, user_id, **deltas)
+
+    ranks = {user_id: (await leaderboard.rank_of(db, user_id))["rank"] for user_id in activity}
+    # u2 and u3 are tied on 25 points
+    assert ranks == {"u1": 1, "u2": 2, "u3": 2, "u4": 4}
+    assert [row["rank"] for row in await leaderboard.top(db)] == [1, 2, 2, 4]
+    assert (await leaderboard.rank_of(db, "nobody"))["rank"] == 5
+
+
+async def test_score_counts_follow_concurrent_activity(db):
+    await asyncio.gather(*(
+        leaderboard.record_activity(db, f"u{i % 10}", enrollments=1) for i in range(100)
+    ))
+    assert await _counts(db) == {50: 10}
+
+    await leaderboard.record_activity(db, "u0", buildsShared=1)
+    assert await _counts(db) == {50: 9, 75: 1}
+
+    await db.leaderboard_scores.delete_many({})
+    await leaderboard.rebuild_score_counts(db)
+    assert await _counts(db) == {50: 9, 75: 1}
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from media import MediaStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MediaStore(tmp_path, max_upload_bytes=1024 * 1024, workers=1, sizes={"sm": 8})
+    store.start()
+    yield store
+    store.close()
+
+
+def _image(image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 16), "teal").save(buffer, image_format)
+    return buffer.getvalue()
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.parametrize("image_format, content_type", [("WEBP", "image/webp"), ("PNG", "image/png")])
+async def test_upload_streamed_a_byte_at_a_time_is_recognised(store, tmp_path, image_format, content_type):
+    media = await store.save(_chunks(_image(image_format), 1))
+    assert media["content_type"] == content_type
+    assert (media["width"], media["height"]) == (32, 16)
+    assert (tmp_path / "thumbs" / media["id"][:2] / f"{media['id']}-sm.webp").is_file()
+
+
+async def test_upload_shorter_than_a_signature_is_sniffed_at_the_end(store):
+    with pytest.raises(HTTPException) as rejected:
+        await store.save(_chunks(b"GIF8", 1))
+    assert rejected.value.status_code == 415
+
+
+async def test_non_image_is_rejected_once_enough_bytes_arrive(store, tmp_path):
+    with pytest.raises(HTTPException) as rejected:
+        await store.save(_chunks(b"<html>" + b"x" * 100, 3))
+    assert rejected.value.status_code == 415
+    assert not any((tmp_path / "tmp").iterdir())
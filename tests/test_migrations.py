@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from migrations import MIGRATIONS_COLLECTION, Migration, run_migrations
+
+pytestmark = pytest.mark.anyio
+
+
+def _slow_migration(runs: list, seconds: float) -> Migration:
+    async def apply(db):
+        runs.append(asyncio.current_task().get_name())
+        await asyncio.sleep(seconds)
+    return Migration(1, "slow", apply)
+
+
+async def test_lease_is_renewed_while_a_long_migration_runs():
+    db = AsyncMongoMockClient()["test_database"]
+    runs = []
+    migrations = [_slow_migration(runs, 0.5)]
+
+    # The migration outlives the 0.15s lease several times over
+    workers = [
+        asyncio.create_task(run_migrations(db, migrations, lock_ttl=0.15, poll_interval=0.02), name=f"w{i}")
+        for i in range(3)
+    ]
+    results = await asyncio.gather(*workers)
+
+    assert len(runs) == 1
+    assert sorted(map(len, results)) == [0, 0, 1]
+    assert (await db[MIGRATIONS_COLLECTION].find_one({"_id": "state"}))["version"] == 1
+    assert await db[MIGRATIONS_COLLECTION].find_one({"_id": "lock"}) is None
+
+
+async def test_waiting_worker_fails_instead_of_skipping_migrations():
+    db = AsyncMongoMockClient()["test_database"]
+    migrations = [_slow_migration([], 0.5)]
+
+    holder = asyncio.create_task(run_migrations(db, migrations, lock_ttl=0.15))
+    await asyncio.sleep(0.05)
+    with pytest.raises(RuntimeError, match="Timed out"):
+        await run_migrations(db, migrations, lock_ttl=0.15, wait_timeout=0.2, poll_interval=0.02)
+    assert await holder == ["slow"]
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+import auth
+import server
+import session_cache as session_cache_module
+from session_cache import SessionCache, session_cache
+
+LATER = datetime.now(timezone.utc) + timedelta(days=1)
+
+
+@pytest.fixture(autouse=True)
+def empty_shared_cache():
+    yield
+    session_cache.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time.time() for the cache module"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(session_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SessionCache(ttl_seconds=60)
+    cache.set("tok", {"id": "u1"}, LATER)
+    clock[0] += 59
+    assert cache.get("tok") == {"id": "u1"}
+    clock[0] += 2
+    assert cache.get("tok") is None
+    assert cache.stats()["size"] == 0 and cache.misses == 1
+
+
+def test_entries_never_outlive_their_session(clock):
+    cache = SessionCache(ttl_seconds=60)
+    expires_at = datetime.fromtimestamp(clock[0] + 10, timezone.utc)
+    cache.set("tok", {"id": "u1"}, expires_at)
+    clock[0] += 11
+    assert cache.get("tok") is None
+    assert cache.user_id("tok") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SessionCache(max_entries=2)
+    cache.set("a", {"id": "u1"}, LATER)
+    cache.set("b", {"id": "u2"}, LATER)
+    cache.get("a")
+    cache.set("c", {"id": "u3"}, LATER)
+
+    assert [token for token, _ in cache.entries()] == ["a", "c"]
+    assert cache.evictions == 1
+    # The evicted token is gone from the per-user index too
+    cache.invalidate_user("u2")
+    assert cache.invalidations == 0
+
+
+def test_invalidation_by_token_user_and_session():
+    cache = SessionCache()
+    cache.set("a", {"id": "u1"}, LATER, "s-a")
+    cache.set("b", {"id": "u1"}, LATER, "s-b")
+    cache.set("c", {"id": "u2"}, LATER, "s-c")
+
+    cache.invalidate_session("s-c")
+    assert cache.get("c") is None
+    cache.invalidate_token("a")
+    assert cache.get("a") is None and cache.get("b") == {"id": "u1"}
+    cache.invalidate_user("u1")
+    assert cache.entries() == [] and cache.invalidations == 3
+
+
+def test_cached_users_are_copies():
+    cache = SessionCache()
+    user = {"id": "u1", "name": "before"}
+    cache.set("tok", user, LATER)
+    user["name"] = "after"
+    cache.get("tok")["name"] = "changed"
+    assert cache.get("tok")["name"] == "before"
+
+
+async def _login(db, token: str, user_id: str = "u1") -> dict:
+    await db.users.update_one({"id": user_id}, {"$set": {"email": f"{user_id}@example.com", "name": user_id}}, upsert=True)
+    await db.sessions.insert_one({"session_token": token, "user_id": user_id, "expires_at": LATER})
+    return await auth.get_current_user(token, None)
+
+
+@pytest.mark.anyio
+async def test_logout_drops_every_cached_session_of_the_user(db):
+    user = await _login(db, "tok-1")
+    await _login(db, "tok-2")
+    assert session_cache.user_id("tok-1") == session_cache.user_id("tok-2") == "u1"
+
+    await server.logout(Response(), current_user=user)
+
+    assert session_cache.user_id("tok-1") is None and session_cache.user_id("tok-2") is None
+    with pytest.raises(HTTPException) as rejected:
+        await auth.get_current_user("tok-1", None)
+    assert rejected.value.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_session_deleted_elsewhere_is_dropped_on_verification(db):
+    await _login(db, "tok-kept", "u1")
+    await _login(db, "tok-gone", "u2")
+    # Another worker deletes the session; this one still has it cached
+    await db.sessions.delete_one({"session_token": "tok-gone"})
+    assert session_cache.user_id("tok-gone") == "u2"
+
+    await auth.verify_cached_sessions(db)
+
+    assert session_cache.user_id("tok-gone") is None
+    assert session_cache.user_id("tok-kept") == "u1"